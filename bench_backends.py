@@ -0,0 +1,82 @@
+"""
+Benchmark de backends FTP de SCBox
+
+Descarga una carpeta remota completa en carpetas temporales con cada backend
+(ftplib bloqueante y asyncio) usando el scb.config de una raíz, y compara los
+tiempos. Opcionalmente lanza varias descargas simultáneas para medir el costo
+de muchas conexiones en paralelo.
+
+Uso:
+    python bench_backends.py <raiz> [carpeta_remota_relativa] [N] [simultaneas]
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+DIRECTORIO_SCBOX = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRECTORIO_SCBOX)
+
+from scbox import ARCHIVO_CONFIG, BACKENDS_FTP, SyncSession, cargar_configuracion
+
+
+def descargar_copia(config, carpeta, backend):
+    """Descarga `carpeta` en una raíz temporal vacía y devuelve (segundos, bytes)"""
+    raiz = tempfile.mkdtemp(prefix='scbox-bench-')
+    try:
+        os.makedirs(os.path.join(raiz, carpeta), exist_ok=True)
+        with SyncSession(raiz, config, ignore_list=[], backend=backend) as sesion:
+            inicio = time.perf_counter()
+            resultado = sesion.bajar(carpeta)
+            segundos = time.perf_counter() - inicio
+        if not resultado.exitoso:
+            raise RuntimeError(f"La descarga con {backend} terminó con errores")
+        return segundos, resultado.estadisticas.tamano_transferido
+    finally:
+        shutil.rmtree(raiz, ignore_errors=True)
+
+
+def medir_backend(config, carpeta, backend, repeticiones, simultaneas):
+    """Mediana del tiempo de `simultaneas` descargas en paralelo, repetidas `repeticiones` veces"""
+    tiempos = []
+    transferido = 0
+    for _ in range(repeticiones):
+        resultados = [None] * simultaneas
+
+        def tarea(indice):
+            resultados[indice] = descargar_copia(config, carpeta, backend)
+
+        hilos = [threading.Thread(target=tarea, args=(i,)) for i in range(simultaneas)]
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        tiempos.append(time.perf_counter() - inicio)
+        if None in resultados:
+            raise RuntimeError(f"Alguna descarga con {backend} falló")
+        transferido = sum(bytes_ for _, bytes_ in resultados)
+
+    mediana = statistics.median(tiempos)
+    print(f"⏱️ {backend:8} mediana {mediana * 1000:.0f} ms, mínimo {min(tiempos) * 1000:.0f} ms, "
+          f"{transferido / mediana / 1024 / 1024:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    config = cargar_configuracion(os.path.join(sys.argv[1], ARCHIVO_CONFIG))
+    carpeta = sys.argv[2] if len(sys.argv) > 2 else '.'
+    repeticiones = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    simultaneas = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    print(f"📂 Carpeta: {carpeta}, {repeticiones} repeticiones, {simultaneas} descarga(s) simultánea(s)")
+    for backend in BACKENDS_FTP:
+        medir_backend(config, carpeta, backend, repeticiones, simultaneas)
@@ -0,0 +1,81 @@
+"""
+Benchmark de FTPS de SCBox
+
+Mide el costo de abrir un canal de datos con el scb.config de una raíz: con
+TLS reanudando la sesión del canal de control (lo que hace SCBox), con un
+handshake TLS completo por canal y, como referencia, sin TLS. Cada canal de
+datos es un listado NLST de la carpeta inicial del servidor.
+
+Con --local no hace falta un servidor: levanta servidor_ftps_prueba.py en
+127.0.0.1 con un certificado autofirmado (requiere el comando openssl).
+
+Uso:
+    python bench_ftps.py <raiz> [N]
+    python bench_ftps.py --local [N]
+"""
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DIRECTORIO_SCBOX = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRECTORIO_SCBOX)
+
+from scbox import ARCHIVO_CONFIG, FTPSeguro, cargar_configuracion, conectar_ftp
+
+
+def medir_canales(config, repeticiones):
+    """Devuelve (mediana en ms por canal de datos, canales TLS reanudados) sobre una sola conexión"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ftp = conectar_ftp(config)
+    try:
+        ftp.nlst()  # El primer canal no cuenta: con TLS 1.3 el ticket de sesión puede llegar tarde
+        previos = getattr(ftp, 'canales_reanudados', 0)
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            ftp.nlst()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos), getattr(ftp, 'canales_reanudados', 0) - previos
+    finally:
+        ftp.quit()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    servidor = None
+    if sys.argv[1] == '--local':
+        from servidor_ftps_prueba import configuracion_prueba, generar_certificado, iniciar_servidor
+        carpeta = tempfile.mkdtemp(prefix='scbox-bench-ftps-')
+        for i in range(20):
+            with open(os.path.join(carpeta, f'archivo_{i}.txt'), 'w') as f:
+                f.write('x' * 100)
+        certificado, clave = generar_certificado(carpeta)
+        servidor = iniciar_servidor(carpeta, certificado, clave)
+        config = configuracion_prueba(servidor.server_address[1], certificado)
+    else:
+        config = cargar_configuracion(os.path.join(sys.argv[1], ARCHIVO_CONFIG))
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"📂 Servidor: {config['FTP']['ftp_server']}, {repeticiones} canales de datos por modo")
+
+    modos = [("sin TLS", dict(config, FTP=dict(config['FTP'], tls=False)), None)]
+    if config['FTP'].get('tls'):
+        modos += [("TLS, sesión reanudada", config, True), ("TLS, handshake completo", config, False)]
+    else:
+        print("ℹ️ La configuración no usa TLS (\"tls\": true): solo se mide sin TLS")
+
+    for nombre, configuracion, reutilizar in modos:
+        FTPSeguro.reutilizar_sesion = bool(reutilizar)
+        mediana, reanudados = medir_canales(configuracion, repeticiones)
+        detalle = f" ({reanudados}/{repeticiones} reanudados)" if reutilizar is not None else ""
+        print(f"⏱️ {nombre:24} {mediana:.2f} ms por canal de datos{detalle}")
+    FTPSeguro.reutilizar_sesion = True
+    if servidor:
+        print(f"🔁 Según el servidor: {servidor.canales_reanudados}/{servidor.canales_datos} canales TLS reanudados")
+        servidor.shutdown()
@@ -0,0 +1,69 @@
+"""
+Benchmark de arranque de SCBox
+
+Mide el costo de importar scbox.py (sin efectos secundarios) y, opcionalmente,
+el tiempo de una sincronización sin cambios sobre una raíz ya sincronizada.
+
+Uso:
+    python bench_startup.py                 # solo tiempo de importación
+    python bench_startup.py <raiz> [N]      # además, sincronización sin cambios
+"""
+
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DIRECTORIO_SCBOX = os.path.dirname(os.path.abspath(__file__))
+REPETICIONES = 10
+
+
+def medir_proceso(codigo, repeticiones=REPETICIONES):
+    """Devuelve la mediana en milisegundos de ejecutar `codigo` en un intérprete nuevo"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, '-c', codigo], cwd=DIRECTORIO_SCBOX, check=True)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def medir_importacion():
+    """Tiempo de importación de scbox descontando el arranque del intérprete"""
+    base = medir_proceso('pass')
+    con_import = medir_proceso('import scbox')
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import scbox'],
+                            cwd=DIRECTORIO_SCBOX, capture_output=True, text=True).stderr
+    acumulado = next((int(linea.split('|')[1]) for linea in salida.splitlines()
+                      if linea.rstrip().endswith('| scbox')), None)
+    print(f"⏱️ Intérprete vacío:        {base:.1f} ms")
+    print(f"⏱️ Intérprete + import:     {con_import:.1f} ms")
+    print(f"⏱️ Costo de importar scbox: {con_import - base:.1f} ms")
+    if acumulado is not None:
+        print(f"⏱️ -X importtime (scbox):   {acumulado / 1000:.1f} ms")
+
+
+def medir_sincronizacion_sin_cambios(raiz, repeticiones):
+    """Mediana del tiempo de `sincronizar()` sobre una raíz sin cambios pendientes"""
+    sys.path.insert(0, DIRECTORIO_SCBOX)
+    from scbox import SyncSession
+
+    tiempos = []
+    with SyncSession(raiz) as sesion:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sesion.sincronizar()  # Deja la raíz al día y la conexión abierta
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                sesion.sincronizar()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+    print(f"⏱️ Sincronización sin cambios ({repeticiones} ejecuciones): "
+          f"mediana {statistics.median(tiempos):.1f} ms, mínimo {min(tiempos):.1f} ms")
+
+
+if __name__ == "__main__":
+    medir_importacion()
+    if len(sys.argv) > 1:
+        medir_sincronizacion_sin_cambios(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 5)
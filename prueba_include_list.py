@@ -0,0 +1,127 @@
+"""
+Comprobación de "include_list" de SCBox
+
+Verifica que ReglasInclusion se comporte como dicen los ejemplos del manual
+("docs/clientes", "proyectos/*/planos", "fotos/**", "**/*.pdf" y
+"proyectos/**/planos") y que una descarga real con perfil parcial traiga solo
+esas rutas. La descarga usa servidor_ftps_prueba.py en 127.0.0.1 (requiere el
+comando openssl; sin él se comprueban solo las reglas).
+
+Uso:
+    python prueba_include_list.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+DIRECTORIO_SCBOX = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRECTORIO_SCBOX)
+
+from scbox import ARCHIVO_CONFIG, ARCHIVO_OPTIONS, ReglasInclusion, SyncSession
+
+# (regla, ruta relativa, es_carpeta, debe procesarse)
+CASOS = [
+    ("docs/clientes", "docs", True, True),  # Lleva a la regla: se recorre
+    ("docs/clientes", "docs/clientes", True, True),
+    ("docs/clientes", "docs/clientes/acme/contrato.pdf", False, True),
+    ("docs/clientes", "docs/interno.txt", False, False),
+    ("docs/clientes", "fotos", True, False),  # No lleva a ninguna regla: ni se recorre
+    ("proyectos/*/planos", "proyectos/casa/planos/p1.dwg", False, True),
+    ("proyectos/*/planos", "proyectos/casa/otros/p1.dwg", False, False),
+    ("proyectos/*/planos", "proyectos/casa/sub/planos/p1.dwg", False, False),
+    ("fotos/**", "fotos/2024/enero/a.jpg", False, True),
+    ("fotos/**", "fotos/a.jpg", False, True),
+    ("fotos/**", "videos/a.mp4", False, False),
+    ("**/*.pdf", "a.pdf", False, True),
+    ("**/*.pdf", "docs/2024/informe.pdf", False, True),
+    ("**/*.pdf", "docs/2024/informe.txt", False, False),
+    ("**/*.pdf", "docs/2024", True, True),  # Puede contener PDF
+    ("proyectos/**/planos", "proyectos/planos/p.dwg", False, True),  # ** como cero carpetas
+    ("proyectos/**/planos", "proyectos/a/b/planos/p.dwg", False, True),
+    ("proyectos/**/planos", "proyectos/a/b/otros/p.dwg", False, False),
+    ("proyectos/**/planos", "otros/planos/p.dwg", False, False),
+]
+
+# Árbol remoto de la prueba de descarga y lo que debe bajar con REGLAS_DESCARGA
+ARBOL_REMOTO = ["docs/clientes/acme/contrato.pdf", "docs/interno.txt", "fotos/2024/a.jpg",
+                "proyectos/casa/planos/p1.dwg", "proyectos/casa/otros/notas.txt",
+                "proyectos/a/b/planos/p2.dwg", "varios/manual.pdf", "varios/leeme.txt"]
+REGLAS_DESCARGA = ["docs/clientes", "fotos/**", "**/*.pdf", "proyectos/**/planos"]
+ESPERADOS_DESCARGA = ["docs/clientes/acme/contrato.pdf", "fotos/2024/a.jpg", "proyectos/a/b/planos/p2.dwg",
+                      "proyectos/casa/planos/p1.dwg", "varios/manual.pdf"]
+
+
+def comprobar_reglas():
+    """Devuelve la lista de casos que no dieron lo esperado"""
+    fallos = []
+    for regla, ruta, es_carpeta, esperado in CASOS:
+        obtenido = ReglasInclusion([regla]).permite(ruta, es_carpeta)
+        if obtenido != esperado:
+            fallos.append(f"{regla!r} con {ruta!r}: {obtenido} (se esperaba {esperado})")
+    return fallos
+
+
+def comprobar_descarga():
+    """Descarga ARBOL_REMOTO con REGLAS_DESCARGA; devuelve (fallos, None) o (None, motivo si se omitió)"""
+    from servidor_ftps_prueba import configuracion_prueba, generar_certificado, iniciar_servidor
+
+    temporal = tempfile.mkdtemp(prefix='scbox-include-')
+    try:
+        remota = os.path.join(temporal, 'servidor')
+        for ruta in ARBOL_REMOTO:
+            os.makedirs(os.path.dirname(os.path.join(remota, ruta)), exist_ok=True)
+            with open(os.path.join(remota, ruta), 'w') as archivo:
+                archivo.write(ruta)
+        try:
+            certificado, clave = generar_certificado(temporal)
+        except (OSError, subprocess.CalledProcessError) as e:
+            return None, f"no se pudo generar el certificado ({e})"
+        servidor = iniciar_servidor(remota, certificado, clave)
+
+        raiz = os.path.join(temporal, 'local')
+        os.makedirs(raiz)
+        with open(os.path.join(raiz, ARCHIVO_CONFIG), 'w') as archivo:
+            json.dump(configuracion_prueba(servidor.server_address[1], certificado), archivo)
+        with open(os.path.join(raiz, ARCHIVO_OPTIONS), 'w') as archivo:
+            json.dump({"ignore_list": [ARCHIVO_CONFIG, ARCHIVO_OPTIONS, "scb.log"],
+                       "include_list": REGLAS_DESCARGA}, archivo)
+        with contextlib.redirect_stdout(io.StringIO()), SyncSession(raiz) as sesion:
+            resultado = sesion.bajar()
+        servidor.shutdown()
+
+        descargados = sorted(
+            os.path.relpath(os.path.join(carpeta, nombre), raiz).replace(os.sep, '/')
+            for carpeta, _, nombres in os.walk(raiz) for nombre in nombres
+            if not nombre.startswith('scb.'))
+        fallos = []
+        if not resultado.exitoso:
+            fallos.append(f"la descarga no terminó bien: {resultado.error or resultado.fallidos}")
+        if descargados != ESPERADOS_DESCARGA:
+            fallos.append(f"se descargó {descargados} (se esperaba {ESPERADOS_DESCARGA})")
+        return fallos, None
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    fallos = comprobar_reglas()
+    print(f"{'✅' if not fallos else '❌'} Reglas: {len(CASOS) - len(fallos)}/{len(CASOS)} casos correctos")
+    for fallo in fallos:
+        print(f"  ❌ {fallo}")
+
+    fallos_descarga, omitida = comprobar_descarga()
+    if omitida:
+        print(f"⏭️ Descarga con perfil parcial omitida: {omitida}")
+    else:
+        print(f"{'✅' if not fallos_descarga else '❌'} Descarga con perfil parcial")
+        for fallo in fallos_descarga:
+            print(f"  ❌ {fallo}")
+        fallos += fallos_descarga
+
+    sys.exit(1 if fallos else 0)
@@ -8,66 +8,231 @@ con manejo robusto de errores y verificación de integridad de archivos.
 import ftplib
 import os
 import json
-from ftplib import FTP
+from ftplib import FTP, FTP_TLS
 import time
 from datetime import datetime, timezone
-import getpass
 import fnmatch
+import posixpath
+import socket
 import sys
-import logging
+import threading
+from collections import deque
 from socket import gaierror, timeout as SocketTimeout
 
+# Módulos usados solo en caminos poco frecuentes (logging, getpass,
+# concurrent.futures) se importan dentro de las funciones que los necesitan
+# para no encarecer el arranque.
+
 # ==============================================
 # CONSTANTES GLOBALES
 # ==============================================
 ARCHIVO_CONFIG = 'scb.config'  # Archivo de configuración principal
 ARCHIVO_OPTIONS = 'scb.options'  # Archivo con patrones a ignorar
+ARCHIVO_DIARIO = 'scb.journal'  # Diario de la operación en curso (para reanudar)
+ARCHIVO_INSTANTANEA = 'scb.snapshot'  # Instantánea del árbol remoto de la última descarga
+ARCHIVO_METRICAS = 'scb.metrics'  # Log JSON de métricas por ejecución (opción "metricas_json")
+CARPETA_PERFILES = 'scb.profile'  # Resultados de --profile
+ARCHIVO_INDICE = 'scb.index'  # Índice de hashes de los archivos locales (scbox index)
+ARCHIVOS_INTERNOS = ('scb.log', ARCHIVO_DIARIO, ARCHIVO_INSTANTANEA, ARCHIVO_METRICAS, CARPETA_PERFILES,
+                     ARCHIVO_INDICE, ARCHIVO_INDICE + '-journal')  # Nunca se sincronizan
+SUFIJO_TEMPORAL = '.tmp'  # Temporales de transferencias en curso (nunca se sincronizan)
 LOG_TEMPLATE = "Log generado el: {fecha}\nCarpeta: {carpeta}\n"
 HISTORIAL_TEMPLATE = "{fecha} {hora} el usuario {usuario} {accion} {tipo} {descripcion}"
 DESCARGAS_PERMITIDAS_RECONEXION = 50  # Número máximo de descargas antes de reconectar
-MAX_REINTENTOS = 1  # Máximo de reintentos por operación
+MAX_INTENTOS_COLA = 3  # Intentos totales por elemento antes de darlo por fallido
+ESPERA_BASE_REINTENTO = 5  # Segundos de espera antes del primer reintento (se duplica en cada intento)
+LOTE_DIARIO = 50  # Entradas acumuladas antes de forzar escritura del diario a disco
+INTERVALO_DIARIO = 2  # Segundos máximos entre escrituras del diario a disco
+MAX_CONEXIONES_MULTI = 8  # Conexiones FTP simultáneas en total en modo multi-raíz
+MAX_CONEXIONES_POR_SERVIDOR = 4  # Conexiones FTP simultáneas por servidor/usuario en modo multi-raíz
+LIMITE_PENDIENTES_MEMORIA = 10000  # Elementos por carpeta retenidos en memoria antes de volcar a disco
+MAX_ENTRADAS_INSTANTANEA = 10000  # Archivos por carpeta guardados en la instantánea remota
+VERIFICACION_COMPLETA_CADA = 0  # Cada cuántas descargas se recorre todo sin usar la instantánea (0 = no usarla)
 TIMEOUT_FTP = 180  # Timeout en segundos para conexión FTP
+BACKEND_FTP = 'ftplib'  # Backend FTP por defecto: 'ftplib' (bloqueante) o 'asyncio' (solo para latencia alta)
+BACKENDS_FTP = ('ftplib', 'asyncio')
+TAMANO_LECTURA_ASINCRONA = 256 * 1024  # Bytes pedidos al bucle asyncio por cada lectura de datos
 TIEMPO_ESPERA_RECONEXION = 600
-UMBRAL_BARRA_PROGRESO = 1024 * 1024  # 1MB - Mostrar barra para archivos mayores a este tamaño
+FRECUENCIA_PROGRESO = 10  # Redibujados por segundo del progreso en una terminal
+INTERVALO_PROGRESO_PLANO = 5  # Segundos entre líneas de progreso cuando la salida no es una terminal
+VENTANA_PROGRESO = 5  # Segundos considerados para calcular velocidad y tiempo restante
+PROGRESO_ANCHO_BARRA = 30
+PERFIL_TOP_N = 25  # Funciones listadas en el resumen de --profile
+CATEGORIAS_PERFIL = (  # Funciones integradas (nombre según cProfile) agrupadas por tipo de espera
+    ("Red", ("_socket.", "_ssl.", "select.", "selectors.")),
+    ("Disco y consola", ("posix.", "nt.", "io.open", "_io.")),
+    ("Espera entre hilos", ("_thread.",)),
+    ("Pausas y reintentos", ("time.sleep",)),  # Esperas de reintento y de reconexión
+)
 TAMANO_BLOQUE = 8192  # Tamaño de bloque para transferencias
+TAMANO_BUFFER_ESCRITURA = 1024 * 1024  # Búfer del hilo escritor de descargas
+BUFFERS_ESCRITURA = 8  # Búferes en vuelo entre red y disco por descarga
+FSYNC_DESCARGAS = 'ninguno'  # Política de fsync de descargas: 'ninguno', 'archivo' o 'lote'
+LOTE_FSYNC = 64  # Descargas acumuladas antes de forzarlas a disco con la política 'lote'
+ALGORITMO_HASH = 'sha256'  # Hash del contenido de los archivos locales en scb.index
+HILOS_HASH = os.cpu_count() or 4  # Hilos que calculan hashes en paralelo (opción "hilos_hash")
+TAMANO_LECTURA_HASH = 1024 * 1024  # Bytes leídos por lectura al calcular un hash
+UMBRAL_MMAP_HASH = 64 * 1024 * 1024  # Desde este tamaño el archivo se mapea en memoria en lugar de leerse
+INTERVALO_GUARDADO_INDICE = 5  # Segundos entre confirmaciones de scb.index durante el indexado
 
 # ==============================================
 # CLASES AUXILIARES
 # ==============================================
+class MonitorProgreso:
+    """
+    Progreso agregado de todas las transferencias activas del proceso.
+    
+    Cada transferencia solo suma bytes en su propia barra; el monitor redibuja
+    como mucho FRECUENCIA_PROGRESO veces por segundo una única línea con el total
+    transferido, la velocidad, los archivos por segundo y el tiempo restante
+    estimado de todas las transferencias en curso. Si la salida no es una terminal
+    (tubería, archivo de log, modo multi) escribe en su lugar una línea simple cada
+    INTERVALO_PROGRESO_PLANO segundos.
+    
+    actualizar() se llama por cada bloque transferido, así que entre dibujos solo
+    compara el reloj con el próximo dibujo: no toma el candado ni consulta si la
+    salida es una terminal (eso se revisa al dibujar y solo si sys.stdout cambió).
+    """
+
+    _instancia = None
+    _candado_instancia = threading.Lock()
+
+    @classmethod
+    def obtener(cls):
+        """Devuelve el monitor compartido del proceso"""
+        with cls._candado_instancia:
+            if cls._instancia is None:
+                cls._instancia = cls()
+            return cls._instancia
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.activas = []
+        self._bytes_finalizados = 0  # Bytes de las transferencias que ya terminaron
+        self.archivos_completados = 0
+        self._muestras = deque()  # (instante, bytes_totales, archivos_completados)
+        self._proximo_dibujo = 0.0
+        self._ancho_linea = 0  # Largo de la línea de terminal dibujada (0 si no hay)
+        self._salida = None  # sys.stdout sobre el que se calculó _terminal
+        self._terminal = False
+        self._es_terminal()
+
+    @property
+    def bytes_totales(self):
+        """Bytes transferidos por todas las transferencias (activas y terminadas)"""
+        return self._bytes_finalizados + sum(b.transferido - b.previo for b in self.activas)
+
+    def registrar(self, barra):
+        with self._lock:
+            if not self.activas and not self._muestras:
+                self._muestras.append((time.monotonic(), self.bytes_totales, self.archivos_completados))
+            self.activas.append(barra)
+
+    def actualizar(self):
+        ahora = time.monotonic()
+        if ahora >= self._proximo_dibujo:
+            with self._lock:
+                if ahora >= self._proximo_dibujo:  # Otro hilo pudo dibujar mientras se esperaba el candado
+                    self._dibujar(ahora)
+
+    def finalizar(self, barra, completada):
+        with self._lock:
+            if barra in self.activas:
+                self.activas.remove(barra)
+                self._bytes_finalizados += barra.transferido - barra.previo
+            if completada:
+                self.archivos_completados += 1
+            if not self.activas and self._ancho_linea:
+                # Borrar la línea para que la salida siguiente empiece limpia
+                self._escribir('\r' + ' ' * self._ancho_linea + '\r')
+                self._ancho_linea = 0
+
+    def _es_terminal(self):
+        salida = sys.stdout
+        if salida is not self._salida:
+            self._salida = salida
+            isatty = getattr(salida, 'isatty', None)
+            try:
+                self._terminal = bool(isatty and isatty())
+            except ValueError:
+                self._terminal = False  # Salida cerrada
+        return self._terminal
+
+    def _escribir(self, texto):
+        sys.stdout.write(texto)
+        sys.stdout.flush()
+
+    def _dibujar(self, ahora):
+        terminal = self._es_terminal()
+        self._proximo_dibujo = ahora + (1 / FRECUENCIA_PROGRESO if terminal else INTERVALO_PROGRESO_PLANO)
+        bytes_totales = self.bytes_totales
+        self._muestras.append((ahora, bytes_totales, self.archivos_completados))
+        while len(self._muestras) > 2 and ahora - self._muestras[0][0] > VENTANA_PROGRESO:
+            self._muestras.popleft()
+        inicio, bytes_inicio, archivos_inicio = self._muestras[0]
+        transcurrido = ahora - inicio
+        velocidad = (bytes_totales - bytes_inicio) / transcurrido if transcurrido > 0 else 0
+        archivos_por_segundo = (self.archivos_completados - archivos_inicio) / transcurrido if transcurrido > 0 else 0
+
+        conocidas = [b for b in self.activas if b.tamano_total]
+        total = sum(b.tamano_total for b in conocidas)
+        hecho = sum(min(b.transferido, b.tamano_total) for b in conocidas)
+        eta = self._formatear_tiempo((total - hecho) / velocidad) if velocidad > 0 and total else "--:--"
+        detalle = self.activas[0].nombre[:20] if len(self.activas) == 1 else f"{len(self.activas)} activas"
+
+        if terminal:
+            barra = ''
+            if total:
+                porcentaje = min(100, hecho / total * 100)
+                llenas = int(PROGRESO_ANCHO_BARRA * porcentaje / 100)
+                # Formato: [=====>    ] 45% 1.2/2.5MB 3.4MB/s 2.0 arch/s ETA 00:12 nombre.txt
+                barra = (f"[{'=' * (llenas - 1)}>{' ' * (PROGRESO_ANCHO_BARRA - llenas)}] {porcentaje:.0f}% "
+                         f"{self._formatear_tamano(hecho)}/{self._formatear_tamano(total)} ")
+            linea = (f"{barra}{self._formatear_tamano(velocidad)}/s {archivos_por_segundo:.1f} arch/s "
+                     f"ETA {eta} {detalle}")
+            relleno = ' ' * max(0, self._ancho_linea - len(linea))
+            self._escribir('\r' + linea + relleno)
+            self._ancho_linea = len(linea)
+        else:
+            self._escribir(f"📶 Progreso: {self._formatear_tamano(bytes_totales)} transferidos, "
+                           f"{self._formatear_tamano(velocidad)}/s, {archivos_por_segundo:.1f} archivos/s, "
+                           f"ETA {eta}, {detalle}\n")
+
+    @staticmethod
+    def _formatear_tiempo(segundos):
+        minutos, segundos = divmod(int(segundos), 60)
+        horas, minutos = divmod(minutos, 60)
+        return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos:02d}:{segundos:02d}"
+
+    @staticmethod
+    def _formatear_tamano(bytes):
+        for unidad in ['B', 'KB', 'MB', 'GB']:
+            if bytes < 1024:
+                return f"{bytes:.1f}{unidad}"
+            bytes /= 1024
+        return f"{bytes:.1f}TB"
+
 class BarraProgreso:
-    """Muestra una barra de progreso simple para transferencias de archivos"""
+    """Progreso de una transferencia; se muestra agregado con las demás a través de MonitorProgreso"""
     
-    def __init__(self, nombre_archivo, tamano_total):
+    def __init__(self, nombre_archivo, tamano_total, monitor=None):
         self.nombre = os.path.basename(nombre_archivo)
         self.tamano_total = tamano_total
         self.transferido = 0
-        self.ancho = 30
+        self.previo = 0  # Bytes ya presentes al reanudar: cuentan en el porcentaje, no en la velocidad
+        self.monitor = monitor or MonitorProgreso.obtener()
+        self.monitor.registrar(self)
         
     def actualizar(self, bytes_transferidos):
         self.transferido += bytes_transferidos
-        porcentaje = min(100, (self.transferido / self.tamano_total) * 100)
-        barras = int(self.ancho * porcentaje / 100)
-        
-        # Formato: [=====>    ] 45% 1.2/2.5MB nombre.txt
-        sys.stdout.write(
-            f"\r[{'=' * (barras - 1)}>{' ' * (self.ancho - barras)}] "
-            f"{porcentaje:.0f}% "
-            f"{self._formatear_tamano(self.transferido)}/"
-            f"{self._formatear_tamano(self.tamano_total)} "
-            f"{self.nombre[:20]}{' ' * 5}"
-        )
-        sys.stdout.flush()
+        self.monitor.actualizar()
         
     def completado(self):
-        sys.stdout.write("\n")
-        sys.stdout.flush()
-        
-    def _formatear_tamano(self, bytes):
-        for unidad in ['B', 'KB', 'MB', 'GB']:
-            if bytes < 1024:
-                return f"{bytes:.1f}{unidad}"
-            bytes /= 1024
-        return f"{bytes:.1f}TB"
+        self.monitor.finalizar(self, completada=True)
+
+    def descartar(self):
+        """Retira la transferencia del progreso sin contarla como completada (error)"""
+        self.monitor.finalizar(self, completada=False)
 
 class Estadisticas:
     def __init__(self):
@@ -76,6 +241,16 @@ class Estadisticas:
         self.carpetas_creadas = 0
         self.tamano_transferido = 0
         self.errores = 0
+        self.bytes_descargados = 0
+        self.bytes_subidos = 0
+        self.archivos_verificados = 0  # Archivos comparados con el otro lado
+        self.archivos_sin_cambios = 0  # Archivos verificados que no hubo que transferir
+        self.carpetas_omitidas = 0  # Carpetas remotas no recorridas gracias a la instantánea
+        self.reintentos = 0
+        self.reconexiones = 0
+        self.inicio = None  # Marca de tiempo (epoch) del inicio de la operación
+        self.duracion = 0.0  # Segundos
+        self.tiempos_fase = {}  # Segundos por fase ('descarga', 'subida')
         
     def mostrar(self):
         print("\n📊 Estadísticas:")
@@ -83,7 +258,30 @@ class Estadisticas:
         print(f"  - Archivos subidos: {self.archivos_subidos}")
         print(f"  - Carpetas creadas: {self.carpetas_creadas}")
         print(f"  - Tamaño total transferido: {self._formatear_tamano(self.tamano_transferido)}")
+        print(f"  - Archivos verificados: {self.archivos_verificados} ({self.archivos_sin_cambios} sin cambios)")
+        if self.reintentos or self.reconexiones:
+            print(f"  - Reintentos: {self.reintentos}, reconexiones: {self.reconexiones}")
         print(f"  - Errores encontrados: {self.errores}")
+        if self.duracion:
+            fases = ", ".join(f"{fase} {segundos:.1f}s" for fase, segundos in self.tiempos_fase.items())
+            print(f"  - Duración: {self.duracion:.1f}s" + (f" ({fases})" if fases else ""))
+
+    def sumar(self, otra):
+        """Acumula en esta instancia los contadores de otra"""
+        self.archivos_descargados += otra.archivos_descargados
+        self.archivos_subidos += otra.archivos_subidos
+        self.carpetas_creadas += otra.carpetas_creadas
+        self.tamano_transferido += otra.tamano_transferido
+        self.errores += otra.errores
+        self.bytes_descargados += otra.bytes_descargados
+        self.bytes_subidos += otra.bytes_subidos
+        self.archivos_verificados += otra.archivos_verificados
+        self.archivos_sin_cambios += otra.archivos_sin_cambios
+        self.carpetas_omitidas += otra.carpetas_omitidas
+        self.reintentos += otra.reintentos
+        self.reconexiones += otra.reconexiones
+        for fase, segundos in otra.tiempos_fase.items():
+            self.tiempos_fase[fase] = self.tiempos_fase.get(fase, 0.0) + segundos
         
     def _formatear_tamano(self, bytes):
         for unidad in ['B', 'KB', 'MB', 'GB']:
@@ -92,17 +290,1172 @@ class Estadisticas:
             bytes /= 1024
         return f"{bytes:.1f}TB"
 
-# Variable global para estadísticas
-estadisticas = Estadisticas()
+class EscritorDescarga:
+    """
+    Escribe a disco los datos de una descarga desde un hilo dedicado.
+    
+    El hilo de red copia cada bloque recibido en un anillo acotado de búferes
+    reutilizables y el hilo escritor los vuelca al archivo. Así una escritura lenta
+    (USB, unidades de red) no detiene la lectura del socket mientras quede un búfer
+    libre, y el rendimiento queda limitado por el más lento de red y disco.
+    """
+
+    def __init__(self, archivo, en_segundo_plano=True):
+        """
+        Args:
+            archivo: Archivo binario abierto y posicionado donde escribir
+            en_segundo_plano (bool): False para escribir directamente (archivos pequeños)
+        """
+        self.archivo = archivo
+        self.escritos = 0
+        self.error = None
+        self._hilo = None
+        self._actual = None
+        self._llenado = 0
+        if en_segundo_plano:
+            import queue
+            self._libres = queue.Queue()
+            self._llenos = queue.Queue()
+            for _ in range(BUFFERS_ESCRITURA):
+                self._libres.put(bytearray(TAMANO_BUFFER_ESCRITURA))
+            self._hilo = threading.Thread(target=self._volcar, name="scbox-escritor", daemon=True)
+            self._hilo.start()
+
+    def escribir(self, datos):
+        """Encola `datos` para escritura (se bloquea solo si no queda ningún búfer libre)"""
+        if self.error is not None:
+            raise self.error
+        if self._hilo is None:
+            self.archivo.write(datos)
+            self.escritos += len(datos)
+            return
+        vista = memoryview(datos)
+        while vista:
+            if self._actual is None:
+                self._actual = self._libres.get()
+                self._llenado = 0
+            n = min(len(vista), len(self._actual) - self._llenado)
+            self._actual[self._llenado:self._llenado + n] = vista[:n]
+            self._llenado += n
+            vista = vista[n:]
+            if self._llenado == len(self._actual):
+                self._entregar()
+
+    def _entregar(self):
+        self._llenos.put((self._actual, self._llenado))
+        self._actual = None
+
+    def forzar_a_disco(self):
+        """
+        Fuerza a disco lo escrito hasta ahora (puede llamarse mientras el hilo escritor trabaja).
+        
+        Returns:
+            int: Bytes que se sabe que están en disco
+        """
+        escritos = self.escritos
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+        return escritos
+
+    def _volcar(self):
+        while True:
+            elemento = self._llenos.get()
+            if elemento is None:
+                return
+            bufer, n = elemento
+            if self.error is None:
+                try:
+                    self.archivo.write(memoryview(bufer)[:n])
+                    self.escritos += n
+                except OSError as e:
+                    self.error = e  # Se relanza en el hilo de red; el búfer se recicla igual
+            self._libres.put(bufer)
+
+    def cerrar(self):
+        """
+        Vuelca lo pendiente y detiene el hilo escritor. No relanza errores de
+        escritura: quedan en `error` para que el llamador decida.
+        
+        Returns:
+            int: Bytes escritos a disco
+        """
+        if self._hilo is not None:
+            if self._actual is not None and self._llenado:
+                self._entregar()
+            self._llenos.put(None)
+            self._hilo.join()
+            self._hilo = None
+        return self.escritos
+
+class ElementoReintento:
+    """Elemento (archivo o carpeta) cuya transferencia falló y debe reintentarse"""
+
+    def __init__(self, operacion, ruta_ftp, ruta_local, nombre):
+        self.operacion = operacion  # 'descarga' o 'subida'
+        self.ruta_ftp = ruta_ftp
+        self.ruta_local = ruta_local
+        self.nombre = nombre
+        self.intentos = 0
+        self.ultimo_error = None
+        self.proximo_intento = 0
+
+class ColaReintentos:
+    """
+    Cola de elementos fallidos con contador de intentos y espera exponencial.
+
+    Los elementos se reintentan al final de la operación sobre una conexión sana,
+    en lugar de reiniciar el recorrido completo de la carpeta donde ocurrió el error.
+    """
+
+    def __init__(self):
+        self.pendientes = []
+        self.fallidos = []
+        self.registrados = 0  # Total de elementos agregados (permite detectar fallos en un recorrido)
+
+    def agregar(self, operacion, ruta_ftp, ruta_local, nombre, error):
+        self.registrados += 1
+        elemento = ElementoReintento(operacion, ruta_ftp, ruta_local, nombre)
+        self.registrar_fallo(elemento, error)
+
+    def registrar_fallo(self, elemento, error):
+        elemento.intentos += 1
+        elemento.ultimo_error = str(error)
+        if elemento.intentos >= MAX_INTENTOS_COLA:
+            self.fallidos.append(elemento)
+        else:
+            espera = ESPERA_BASE_REINTENTO * (2 ** (elemento.intentos - 1))
+            elemento.proximo_intento = time.time() + espera
+            self.pendientes.append(elemento)
+
+    def siguiente(self):
+        """Extrae el elemento con el reintento más próximo, esperando si aún no corresponde"""
+        elemento = min(self.pendientes, key=lambda e: e.proximo_intento)
+        self.pendientes.remove(elemento)
+        espera = elemento.proximo_intento - time.time()
+        if espera > 0:
+            time.sleep(espera)
+        return elemento
+
+    def abandonar_pendientes(self, error):
+        """Marca como fallidos todos los elementos pendientes"""
+        for elemento in self.pendientes:
+            elemento.ultimo_error = str(error)
+            self.fallidos.append(elemento)
+        self.pendientes = []
+
+    def mostrar(self):
+        if not self.fallidos:
+            return
+        print(f"\n❌ Elementos que no pudieron transferirse ({len(self.fallidos)}):")
+        for elemento in self.fallidos:
+            ruta = elemento.ruta_ftp if elemento.operacion == 'descarga' else elemento.ruta_local
+            print(f"  - [{elemento.operacion}] {ruta} ({elemento.intentos} intentos): {elemento.ultimo_error}")
+
+class DiarioSincronizacion:
+    """
+    Diario en disco de la operación en curso, para poder reanudarla tras una interrupción.
+
+    Cada línea es un registro JSON: inicio de la operación, transferencias planificadas,
+    transferencias y carpetas completadas, y fases terminadas. Los archivos que
+    resultaron sin cambios no se registran: al reanudar se vuelven a comparar. Las entradas se acumulan
+    en memoria y se escriben por lotes con fsync, salvo la planificación de una
+    transferencia, que se escribe antes de empezarla para que un corte durante ella
+    la deje pendiente. Durante una descarga larga se anota además cada tanto cuántos
+    bytes del temporal ya están en disco, porque con espacio preasignado el tamaño
+    del temporal no indica hasta dónde se escribió.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.operacion = None
+        self.directorio = None
+        self.completados = set()
+        self.planificados = {}
+        self.avances = {}  # (op, ruta_ftp) -> bytes del temporal ya forzados a disco
+        self.fases = set()
+        self._archivo = None
+        self._buffer = []
+        self._ultima_escritura = time.time()
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Lee un diario existente ignorando una posible última línea truncada"""
+        diario = cls(ruta)
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            for linea in archivo:
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    break
+                diario._aplicar(entrada)
+        return diario
+
+    def _aplicar(self, entrada):
+        tipo = entrada.get('tipo')
+        clave = (entrada.get('op'), entrada.get('ruta_ftp'))
+        if tipo == 'inicio':
+            self.operacion = entrada['operacion']
+            self.directorio = entrada['directorio']
+        elif tipo == 'plan':
+            self.planificados[clave] = entrada['ruta_local']
+        elif tipo == 'avance':
+            self.avances[clave] = entrada['bytes']
+        elif tipo == 'hecho':
+            self.completados.add(clave)
+            self.planificados.pop(clave, None)
+            self.avances.pop(clave, None)
+        elif tipo == 'fase':
+            self.fases.add(entrada['fase'])
+
+    def iniciar(self, operacion, directorio):
+        self._archivo = open(self.ruta, 'w', encoding='utf-8')
+        self.registrar(tipo='inicio', operacion=operacion, directorio=directorio,
+                       fecha=datetime.now().isoformat(timespec='seconds'))
+        self.escribir()
+
+    def continuar(self):
+        self._archivo = open(self.ruta, 'a', encoding='utf-8')
+
+    def registrar(self, **entrada):
+        self._aplicar(entrada)
+        self._buffer.append(json.dumps(entrada, ensure_ascii=False))
+        if len(self._buffer) >= LOTE_DIARIO or time.time() - self._ultima_escritura > INTERVALO_DIARIO:
+            self.escribir()
+
+    def escribir(self):
+        """Vuelca las entradas acumuladas y fuerza su escritura física"""
+        if self._buffer and self._archivo:
+            self._archivo.write('\n'.join(self._buffer) + '\n')
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self._buffer = []
+        self._ultima_escritura = time.time()
+
+    def planificar(self, op, ruta_ftp, ruta_local):
+        self.registrar(tipo='plan', op=op, ruta_ftp=ruta_ftp, ruta_local=ruta_local)
+        self.escribir()
+
+    def registrar_avance(self, op, ruta_ftp, bytes_en_disco):
+        self.registrar(tipo='avance', op=op, ruta_ftp=ruta_ftp, bytes=bytes_en_disco)
+        self.escribir()
+
+    def avance(self, op, ruta_ftp):
+        """Bytes del temporal de la transferencia que se sabe que están en disco (None si no se anotó)"""
+        return self.avances.get((op, ruta_ftp))
+
+    def completar(self, op, ruta_ftp):
+        self.registrar(tipo='hecho', op=op, ruta_ftp=ruta_ftp)
+
+    def completar_fase(self, fase):
+        self.registrar(tipo='fase', fase=fase)
+        self.escribir()
+
+    def esta_completado(self, op, ruta_ftp):
+        return (op, ruta_ftp) in self.completados
+
+    def pendientes(self, op):
+        """Transferencias planificadas que no llegaron a completarse"""
+        return [(ruta_ftp, ruta_local) for (o, ruta_ftp), ruta_local in self.planificados.items() if o == op]
+
+    def cerrar(self, eliminar=False):
+        try:
+            self.escribir()
+        finally:
+            if self._archivo:
+                self._archivo.close()
+                self._archivo = None
+        if eliminar and os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+class InstantaneaRemota:
+    """
+    Instantánea persistida del árbol remoto para omitir subárboles sin cambios.
+
+    Por cada carpeta remota guarda la huella tomada del listado de su carpeta padre
+    (hechos 'modify' y 'size' de MLSD) y los archivos que contenía con su tamaño y
+    fecha. Solo se registran carpetas cuyo recorrido terminó sin fallos y cuyas
+    subcarpetas quedaron todas registradas.
+
+    La huella de una carpeta no cambia cuando cambia algo más abajo, así que omitir
+    subárboles solo es seguro si los clientes propagan la fecha de las carpetas al
+    subir (MFMT). Si el servidor no lo permite se marca omision_desactivada y la
+    instantánea deja de usarse para omitir carpetas.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.carpetas = {}
+        self.ejecuciones = 0
+        self.omision_desactivada = False
+
+    @classmethod
+    def cargar(cls, ruta):
+        instantanea = cls(ruta)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+            instantanea.carpetas = datos.get('carpetas', {})
+            instantanea.ejecuciones = datos.get('ejecuciones', 0)
+            instantanea.omision_desactivada = datos.get('omision_desactivada', False)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Instantánea remota ilegible, se reconstruirá: {e}")
+        return instantanea
+
+    @staticmethod
+    def huella(hechos):
+        return [hechos.get('modify'), hechos.get('size', hechos.get('sizd'))]
+
+    def sin_cambios(self, ruta_ftp, hechos):
+        datos = self.carpetas.get(ruta_ftp)
+        return datos is not None and hechos.get('modify') is not None and datos['huella'] == self.huella(hechos)
+
+    def archivos_anteriores(self, ruta_ftp):
+        datos = self.carpetas.get(ruta_ftp)
+        return datos['entradas'] if datos else {}
+
+    def registrar(self, ruta_ftp, hechos, entradas):
+        self.carpetas[ruta_ftp] = {'huella': self.huella(hechos), 'entradas': entradas}
+
+    def descartar(self, ruta_ftp):
+        self.carpetas.pop(ruta_ftp, None)
+
+    def guardar(self):
+        """Escribe la instantánea de forma atómica (temporal + reemplazo)"""
+        ruta_temp = self.ruta + '.tmp'
+        with open(ruta_temp, 'w', encoding='utf-8') as archivo:
+            json.dump({'ejecuciones': self.ejecuciones, 'omision_desactivada': self.omision_desactivada,
+                       'carpetas': self.carpetas}, archivo, separators=(',', ':'))
+        os.replace(ruta_temp, self.ruta)
+
+class IndiceLocal:
+    """
+    Índice persistido de hashes del contenido de los archivos locales (scb.index).
+
+    Es una base SQLite: cada entrada se consulta y se actualiza por separado, así
+    que ni la memoria ni el costo de guardar crecen con el tamaño de la raíz. Cada
+    entrada se identifica por la ruta relativa a la raíz y guarda el tamaño, la
+    fecha de modificación en nanosegundos y el inodo con los que se calculó el
+    hash: mientras los tres coincidan el archivo no se vuelve a leer.
+
+    Las entradas de archivos que ya no existen se eliminan por marcado y barrido:
+    el indexado marca cada entrada que encuentra al recorrer y al terminar el
+    recorrido borra las de su carpeta que quedaron sin marcar.
+    """
+
+    def __init__(self, ruta):
+        import sqlite3
+        self.ruta = ruta
+        self._sqlite3 = sqlite3
+        self._conexion = None
+        self.modificado = False  # Hay cambios sin confirmar en disco
+
+    @classmethod
+    def cargar(cls, ruta):
+        indice = cls(ruta)
+        try:
+            indice._abrir()
+        except indice._sqlite3.DatabaseError as e:
+            print(f"⚠️ Índice local ilegible, se reconstruirá: {e}")  # p. ej. el formato JSON anterior
+            indice.cerrar()
+            os.remove(ruta)
+            indice._abrir()
+        return indice
+
+    def _abrir(self):
+        self._conexion = self._sqlite3.connect(self.ruta, check_same_thread=False)
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS archivos (ruta TEXT PRIMARY KEY, tamano INTEGER, "
+                               "mtime_ns INTEGER, inodo INTEGER, hash TEXT, marca INTEGER) WITHOUT ROWID")
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS datos (clave TEXT PRIMARY KEY, valor TEXT)")
+        fila = self._conexion.execute("SELECT valor FROM datos WHERE clave = 'algoritmo'").fetchone()
+        if fila is None or fila[0] != ALGORITMO_HASH:
+            self._conexion.execute("DELETE FROM archivos")
+            self._conexion.execute("INSERT OR REPLACE INTO datos VALUES ('algoritmo', ?)", (ALGORITMO_HASH,))
+        self._conexion.commit()
+
+    def hash_vigente(self, ruta_relativa, tamano, mtime_ns, inodo, marca=None):
+        """
+        Devuelve el hash guardado si el archivo no cambió desde que se calculó (None si no).
+        Con `marca` deja la entrada vigente marcada para el barrido de ese indexado.
+        """
+        fila = self._conexion.execute("SELECT tamano, mtime_ns, inodo, hash FROM archivos WHERE ruta = ?",
+                                      (ruta_relativa,)).fetchone()
+        if fila is None or fila[:3] != (tamano, mtime_ns, inodo):
+            return None
+        if marca is not None:
+            self._conexion.execute("UPDATE archivos SET marca = ? WHERE ruta = ?", (marca, ruta_relativa))
+            self.modificado = True
+        return fila[3]
+
+    def registrar(self, ruta_relativa, tamano, mtime_ns, inodo, hash_, marca=None):
+        self._conexion.execute("INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?)",
+                               (ruta_relativa, tamano, mtime_ns, inodo, hash_, marca))
+        self.modificado = True
+
+    def barrer(self, prefijo, marca):
+        """
+        Elimina las entradas bajo `prefijo` ('' para toda la raíz) que no llevan `marca`.
+        
+        Returns:
+            int: Entradas eliminadas
+        """
+        cursor = self._conexion.execute(
+            "DELETE FROM archivos WHERE substr(ruta, 1, ?) = ? AND marca IS NOT ?", (len(prefijo), prefijo, marca))
+        self.modificado = True
+        return cursor.rowcount
+
+    def guardar(self):
+        """
+        Confirma en disco los cambios pendientes.
+        
+        Raises:
+            OSError: Si SQLite no pudo escribir (disco lleno, base bloqueada...)
+        """
+        try:
+            self._conexion.commit()
+        except self._sqlite3.Error as e:
+            raise OSError(f"{self.ruta}: {e}") from e
+        self.modificado = False
+
+    def cerrar(self):
+        if self._conexion is not None:
+            try:
+                if self.modificado:
+                    self.guardar()
+            finally:
+                self._conexion.close()
+                self._conexion = None
+
+class ListaAcotada:
+    """
+    Lista de solo agregado que mantiene en memoria hasta `limite` registros y
+    vuelca el resto a un archivo temporal. Al recorrerla libera los registros ya
+    entregados, de modo que carpetas con cientos de miles de elementos se procesan
+    con memoria acotada.
+    """
+
+    def __init__(self, limite=None):
+        self.limite = limite or LIMITE_PENDIENTES_MEMORIA
+        self._memoria = deque()
+        self._archivo = None
+
+    def agregar(self, registro):
+        if self._archivo is None and len(self._memoria) < self.limite:
+            self._memoria.append(registro)
+            return
+        if self._archivo is None:
+            import tempfile
+            self._archivo = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def __iter__(self):
+        while self._memoria:
+            yield self._memoria.popleft()
+        if self._archivo is not None:
+            self._archivo.seek(0)
+            for linea in self._archivo:
+                yield json.loads(linea)
+
+    def cerrar(self):
+        self._memoria.clear()
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+class ReglasInclusion:
+    """
+    Perfil parcial de la raíz ("include_list" de scb.options): solo se recorren
+    las rutas incluidas y las carpetas que llevan hasta ellas.
+
+    Cada regla es una ruta relativa a la raíz, con comodines por componente
+    ("docs", "proyectos/*/planos") y "**" para cero o más carpetas
+    ("fotos/**", "**/*.pdf", "proyectos/**/planos"). Un elemento está incluido
+    si él o alguna carpeta que lo contiene coincide con una regla completa.
+    """
+
+    def __init__(self, patrones):
+        self.patrones = [tuple(p.replace('\\', '/').strip('/').split('/'))
+                         for p in patrones if p.replace('\\', '/').strip('/')]
+
+    @classmethod
+    def _coincide(cls, partes, patron):
+        """Indica si la ruta `partes` coincide entera con `patron`"""
+        if not patron:
+            return not partes
+        if patron[0] == '**':
+            return any(cls._coincide(partes[i:], patron[1:]) for i in range(len(partes) + 1))
+        return bool(partes) and fnmatch.fnmatch(partes[0], patron[0]) and cls._coincide(partes[1:], patron[1:])
+
+    @classmethod
+    def _puede_contener(cls, partes, patron):
+        """Indica si alguna ruta bajo la carpeta `partes` puede coincidir con `patron`"""
+        if not partes:
+            return bool(patron)
+        if not patron:
+            return False
+        if patron[0] == '**':
+            return True  # "**" puede abarcar esta carpeta y seguir más abajo
+        return fnmatch.fnmatch(partes[0], patron[0]) and cls._puede_contener(partes[1:], patron[1:])
+
+    def incluye(self, partes):
+        return any(self._coincide(partes[:fin], patron)
+                   for patron in self.patrones for fin in range(1, len(partes) + 1))
+
+    def conduce_a_incluido(self, partes):
+        """Indica si la carpeta puede contener algo incluido (es un ancestro de alguna regla)"""
+        return any(self._puede_contener(partes, patron) for patron in self.patrones)
+
+    def permite(self, ruta_relativa, es_carpeta=None):
+        """
+        Indica si hay que procesar un elemento.
+
+        Args:
+            ruta_relativa (str): Ruta del elemento relativa a la raíz
+            es_carpeta (bool): Tipo del elemento (None si se desconoce)
+
+        Returns:
+            bool: True si está incluido o, salvo que sea un archivo, si lleva a algo incluido
+        """
+        ruta = ruta_relativa.replace('\\', '/')
+        if ruta in ('', '.'):
+            return True
+        partes = ruta.split('/')
+        return self.incluye(partes) or (es_carpeta is not False and self.conduce_a_incluido(partes))
+
+class ResultadoSincronizacion:
+    """Resultado estructurado de una operación de SyncSession"""
+
+    def __init__(self, operacion, raiz):
+        self.operacion = operacion  # 'd', 'u', 's' o 'g'
+        self.raiz = raiz
+        self.terminado = False
+        self.estadisticas = Estadisticas()
+        self.fallidos = []  # ElementoReintento que no pudieron transferirse
+        self.error = None
+
+    @property
+    def exitoso(self):
+        return self.terminado and not self.fallidos and self.error is None
+
+class PoolConexiones:
+    """
+    Conexiones FTP compartidas entre sesiones que se ejecutan en paralelo.
+
+    Limita el total de conexiones abiertas (y las de cada servidor/usuario) y
+    reutiliza las conexiones libres del mismo servidor para evitar nuevos logins.
+    Con FTPS las conexiones libres conservan su sesión TLS abierta, y las nuevas
+    reanudan la última sesión del servidor en lugar de negociar una completa.
+    """
+
+    def __init__(self, max_total=MAX_CONEXIONES_MULTI, max_por_servidor=MAX_CONEXIONES_POR_SERVIDOR):
+        self.max_por_servidor = max_por_servidor
+        self._total = threading.BoundedSemaphore(max_total)
+        self._abiertas = {}  # Conexiones abiertas (en uso o libres) por servidor/usuario
+        self._libres = {}
+        self._inicio = {}  # Carpeta inicial tras el login, por servidor/usuario
+        self._lock = threading.Lock()
+        self._cambios = threading.Condition(self._lock)  # Avisa de conexiones devueltas o cerradas
+
+    def _clave(self, config):
+        ftp = config['FTP']
+        return (ftp['ftp_server'], ftp.get('ftp_puerto', 21), ftp['ftp_user'], bool(ftp.get('tls')))
+
+    def _liberar(self, clave):
+        self._total.release()
+        with self._cambios:
+            self._abiertas[clave] -= 1
+            self._cambios.notify_all()
+
+    def _cerrar_una_libre(self):
+        """Cierra una conexión libre cualquiera para hacer lugar a otro servidor"""
+        with self._lock:
+            clave = next((c for c, libres in self._libres.items() if libres), None)
+            if clave is None:
+                return
+            ftp = self._libres[clave].pop()
+        self.descartar_por_clave(clave, ftp)
+
+    def obtener(self, config):
+        """
+        Entrega una conexión libre del mismo servidor o abre una nueva respetando los límites.
+
+        Returns:
+            FTP: Conexión autenticada y posicionada en la carpeta inicial
+        """
+        clave = self._clave(config)
+        while True:
+            # Esperar una conexión libre del servidor o lugar para abrir otra: las
+            # devueltas por otras sesiones se aprovechan aunque ya se esté esperando
+            with self._cambios:
+                while not self._libres.get(clave) and self._abiertas.get(clave, 0) >= self.max_por_servidor:
+                    self._cambios.wait()
+                libres = self._libres.get(clave)
+                if not libres:
+                    self._abiertas[clave] = self._abiertas.get(clave, 0) + 1
+                    break
+                ftp = libres.pop()
+            try:
+                ftp.cwd(self._inicio[clave])
+                return ftp
+            except (*ftplib.all_errors, gaierror, OSError, SocketTimeout):
+                self.descartar_por_clave(clave, ftp)
+
+        try:
+            while not self._total.acquire(timeout=0.5):
+                self._cerrar_una_libre()
+        except BaseException:
+            with self._cambios:
+                self._abiertas[clave] -= 1
+                self._cambios.notify_all()
+            raise
+        try:
+            ftp = conectar_ftp(config)
+            with self._lock:
+                self._inicio.setdefault(clave, ftp.pwd())
+            return ftp
+        except BaseException:
+            self._liberar(clave)
+            raise
+
+    def devolver(self, config, ftp):
+        """Deja una conexión disponible para otra sesión del mismo servidor"""
+        with self._cambios:
+            self._libres.setdefault(self._clave(config), []).append(ftp)
+            self._cambios.notify_all()
+
+    def descartar(self, config, ftp):
+        """Cierra una conexión y libera su lugar"""
+        self.descartar_por_clave(self._clave(config), ftp)
+
+    def descartar_por_clave(self, clave, ftp):
+        try:
+            ftp.quit()
+        except:
+            pass
+        self._liberar(clave)
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres"""
+        with self._lock:
+            libres = [(clave, ftp) for clave, lista in self._libres.items() for ftp in lista]
+            self._libres = {}
+        for clave, ftp in libres:
+            self.descartar_por_clave(clave, ftp)
+
+class SalidaConPrefijo:
+    """
+    Reemplazo de sys.stdout que antepone a cada línea la etiqueta del hilo que la
+    escribe, para que la salida de varias raíces en paralelo siga siendo legible.
+    Las reescrituras con retorno de carro (barras de progreso) se reducen a su
+    último estado.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def etiquetar(self, etiqueta):
+        self._local.prefijo = f"[{etiqueta}] "
+        self._local.buffer = ''
+
+    def write(self, texto):
+        prefijo = getattr(self._local, 'prefijo', None)
+        if prefijo is None:
+            return self.original.write(texto)
+        *lineas, resto = (self._local.buffer + texto).split('\n')
+        if lineas:
+            with self._lock:
+                for linea in lineas:
+                    self.original.write(prefijo + linea.rsplit('\r', 1)[-1] + '\n')
+        self._local.buffer = resto.rsplit('\r', 1)[-1]
+        return len(texto)
+
+    def flush(self):
+        self.original.flush()
 
 # ==============================================
 # CONFIGURACIÓN DE LOGGING
 # ==============================================
-logging.basicConfig(
-    level=logging.WARNING,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.FileHandler('scb.log', mode='a', encoding='utf-8')]
-)
+
+def configurar_logging(raiz):
+    """
+    Inicializa el scb.log de la raíz de sincronización y dirige allí el logging.
+    
+    Se invoca desde el punto de entrada de la línea de comandos una vez resuelta
+    la raíz; importar el módulo no crea archivos ni configura logging.
+    
+    Args:
+        raiz (str): Carpeta raíz de sincronización
+    """
+    import logging
+
+    ruta_log = os.path.join(raiz, 'scb.log')
+    if not os.path.exists(ruta_log):
+        with open(ruta_log, 'w', encoding='utf-8') as archivo:
+            archivo.write(f"Log iniciado - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.FileHandler(ruta_log, mode='a', encoding='utf-8')]
+    )
+
+# ==============================================
+# BACKEND FTP ASÍNCRONO (OPCIONAL)
+# ==============================================
+
+class BucleAsincrono:
+    """
+    Bucle asyncio compartido que corre en un hilo propio.
+    
+    Todas las conexiones del backend asíncrono hacen su E/S de red en este único
+    bucle. Los recorridos siguen siendo síncronos: cada sesión conserva su hilo,
+    que queda bloqueado en ejecutar() mientras el bucle atiende su conexión, y
+    cada llamada cruza de hilo. Por eso el backend no ahorra hilos ni memoria por
+    conexión; lo que aporta es el envío agrupado de comandos de FTPAsincrono, que
+    solo compensa el salto entre hilos con servidores de latencia alta.
+    """
+
+    _instancia = None
+    _candado = threading.Lock()
+
+    @classmethod
+    def obtener(cls):
+        """Devuelve el bucle compartido, creándolo con el primer uso"""
+        with cls._candado:
+            if cls._instancia is None:
+                cls._instancia = cls()
+            return cls._instancia
+
+    def __init__(self):
+        import asyncio
+        self.asyncio = asyncio
+        self.bucle = asyncio.new_event_loop()
+        self.hilo = threading.Thread(target=self.bucle.run_forever, name="scbox-asyncio", daemon=True)
+        self.hilo.start()
+
+    def ejecutar(self, corrutina):
+        """Ejecuta `corrutina` en el bucle y espera su resultado desde el hilo llamador"""
+        futuro = self.asyncio.run_coroutine_threadsafe(corrutina, self.bucle)
+        try:
+            return futuro.result()
+        except BaseException:
+            futuro.cancel()
+            raise
+
+class FTPAsincrono:
+    """
+    Cliente FTP sobre flujos asyncio con la interfaz de ftplib.FTP que usa SCBox.
+    
+    Implementa connect, login, set_pasv, pwd, cwd, sendcmd, voidcmd, size, mkd,
+    delete, rename, retrbinary, retrlines, storbinary, quit y close con la misma
+    semántica y las mismas excepciones que ftplib, por lo que los recorridos de
+    subida y descarga funcionan igual con cualquiera de los dos backends.
+    
+    Los comandos independientes viajan juntos en una sola escritura (pipelining):
+    TYPE + EPSV al abrir el canal de datos, REST + RETR al reanudar, RNFR + RNTO al
+    renombrar y los lotes enviados con sendcmds(). Así se ahorran viajes de ida y
+    vuelta, que solo pesan con latencia alta: en una red local o en loopback este
+    backend es más lento que ftplib (ver BucleAsincrono).
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._bucle = BucleAsincrono.obtener()
+        self._aio = self._bucle.asyncio
+        self._lector = None
+        self._escritor = None
+        self._usar_epsv = True
+        self.sock = None
+        self.host = None
+        self.welcome = None
+        self.encoding = 'utf-8'
+
+    # ----- Canal de control -----
+
+    def _ejecutar(self, corrutina):
+        try:
+            return self._bucle.ejecutar(corrutina)
+        except self._aio.TimeoutError:
+            self.close()
+            raise SocketTimeout("timed out")
+
+    async def _esperar(self, operacion):
+        return await self._aio.wait_for(operacion, self.timeout)
+
+    async def _leer_linea(self):
+        linea = await self._esperar(self._lector.readline())
+        if not linea:
+            raise EOFError
+        return linea.decode(self.encoding).rstrip('\r\n')
+
+    async def _leer_respuesta(self):
+        linea = await self._leer_linea()
+        if linea[3:4] == '-':
+            codigo = linea[:3]
+            lineas = [linea]
+            while True:
+                siguiente = await self._leer_linea()
+                lineas.append(siguiente)
+                if siguiente[:3] == codigo and siguiente[3:4] != '-':
+                    break
+            linea = '\n'.join(lineas)
+        return linea
+
+    async def _enviar(self, *comandos):
+        """Envía los comandos en una sola escritura y devuelve sus respuestas en orden"""
+        if self._escritor is None:
+            raise ConnectionError("Conexión FTP cerrada")
+        for comando in comandos:
+            if '\r' in comando or '\n' in comando:
+                raise ValueError('an illegal newline character should not be contained')
+        self._escritor.write(''.join(comando + '\r\n' for comando in comandos).encode(self.encoding))
+        await self._esperar(self._escritor.drain())
+        return [await self._leer_respuesta() for _ in comandos]
+
+    @staticmethod
+    def _verificar(respuesta):
+        """Traduce una respuesta de error a la excepción que lanzaría ftplib"""
+        if respuesta[:1] in ('1', '2', '3'):
+            return respuesta
+        if respuesta[:1] == '4':
+            raise ftplib.error_temp(respuesta)
+        if respuesta[:1] == '5':
+            raise ftplib.error_perm(respuesta)
+        raise ftplib.error_proto(respuesta)
+
+    def connect(self, host='', port=21, timeout=None):
+        if timeout is not None:
+            self.timeout = timeout
+        self.host = host
+
+        async def abrir():
+            self._lector, self._escritor = await self._esperar(self._aio.open_connection(host, port))
+            return await self._leer_respuesta()
+
+        self.welcome = self._verificar(self._ejecutar(abrir()))
+        self.sock = self._escritor.get_extra_info('socket')
+        return self.welcome
+
+    def login(self, user='anonymous', passwd='', acct=''):
+        respuesta = self.sendcmd('USER ' + user)
+        if respuesta[0] == '3':
+            respuesta = self.sendcmd('PASS ' + passwd)
+        if respuesta[0] == '3':
+            respuesta = self.sendcmd('ACCT ' + acct)
+        if respuesta[0] != '2':
+            raise ftplib.error_reply(respuesta)
+        return respuesta
+
+    def set_pasv(self, valor):
+        if not valor:
+            raise ValueError("El backend asíncrono solo admite modo pasivo")
+
+    def sendcmd(self, comando):
+        return self._verificar(self._ejecutar(self._enviar(comando))[0])
+
+    def sendcmds(self, comandos):
+        """
+        Envía varios comandos independientes en una sola ida y vuelta.
+        
+        Returns:
+            list: Respuesta de cada comando, o la excepción ftplib correspondiente
+        """
+        respuestas = []
+        for respuesta in self._ejecutar(self._enviar(*comandos)):
+            try:
+                respuestas.append(self._verificar(respuesta))
+            except ftplib.Error as e:
+                respuestas.append(e)
+        return respuestas
+
+    def voidcmd(self, comando):
+        respuesta = self.sendcmd(comando)
+        if respuesta[:1] != '2':
+            raise ftplib.error_reply(respuesta)
+        return respuesta
+
+    def pwd(self):
+        respuesta = self.voidcmd('PWD')
+        return ftplib.parse257(respuesta) if respuesta[:3] == '257' else ''
+
+    def cwd(self, carpeta):
+        if carpeta == '..':
+            try:
+                return self.voidcmd('CDUP')
+            except ftplib.error_perm as e:
+                if e.args[0][:3] != '500':
+                    raise
+        return self.voidcmd('CWD ' + (carpeta or '.'))
+
+    def size(self, archivo):
+        respuesta = self.sendcmd('SIZE ' + archivo)
+        if respuesta[:3] == '213':
+            return int(respuesta[3:].strip())
+
+    def mkd(self, carpeta):
+        respuesta = self.voidcmd('MKD ' + carpeta)
+        return ftplib.parse257(respuesta) if respuesta[:3] == '257' else ''
+
+    def delete(self, archivo):
+        respuesta = self.sendcmd('DELE ' + archivo)
+        if respuesta[:3] in ('250', '200'):
+            return respuesta
+        raise ftplib.error_reply(respuesta)
+
+    def rename(self, origen, destino):
+        rnfr, rnto = self._ejecutar(self._enviar('RNFR ' + origen, 'RNTO ' + destino))
+        if self._verificar(rnfr)[:1] != '3':
+            raise ftplib.error_reply(rnfr)
+        if self._verificar(rnto)[:1] != '2':
+            raise ftplib.error_reply(rnto)
+        return rnto
+
+    def quit(self):
+        try:
+            return self.sendcmd('QUIT')
+        finally:
+            self.close()
+
+    def close(self):
+        escritor, self._escritor, self._lector, self.sock = self._escritor, None, None, None
+        if escritor is not None:
+            self._bucle.bucle.call_soon_threadsafe(escritor.close)
+
+    # ----- Canal de datos -----
+
+    async def _abrir_datos(self, tipo, comando, rest):
+        """Abre el canal de datos pasivo y envía el comando de transferencia"""
+        respuesta_tipo, respuesta = await self._enviar('TYPE ' + tipo, 'EPSV' if self._usar_epsv else 'PASV')
+        self._verificar(respuesta_tipo)
+        if self._usar_epsv and respuesta[:1] == '5':
+            self._usar_epsv = False  # El servidor no admite EPSV
+            respuesta, = await self._enviar('PASV')
+        self._verificar(respuesta)
+        par = self._escritor.get_extra_info('peername')
+        if self._usar_epsv:
+            host, puerto = ftplib.parse229(respuesta, par)
+        else:
+            host, puerto = par[0], ftplib.parse227(respuesta)[1]
+
+        lector, escritor = await self._esperar(
+            self._aio.open_connection(host, puerto, limit=TAMANO_LECTURA_ASINCRONA))
+        comandos = (f'REST {rest}', comando) if rest is not None else (comando,)
+        respuestas = await self._enviar(*comandos)
+        try:
+            if rest is not None and self._verificar(respuestas[0])[:1] != '3':
+                raise ftplib.error_reply(respuestas[0])
+            if self._verificar(respuestas[-1])[:1] != '1':
+                raise ftplib.error_reply(respuestas[-1])
+        except Exception:
+            escritor.close()
+            raise
+        return lector, escritor
+
+    async def _recibir(self, lector, escritor, tamano):
+        """
+        Lee hasta `tamano` bytes del canal de datos. Al llegar al final cierra el
+        canal y lee la respuesta final en la misma ida al bucle.
+        
+        Returns:
+            tuple: (datos, respuesta final o None si quedan datos por leer)
+        """
+        partes = []
+        total = 0
+        while total < tamano:
+            bloque = await self._esperar(lector.read(tamano - total))
+            if not bloque:
+                return b''.join(partes), await self._cerrar_datos(escritor)
+            partes.append(bloque)
+            total += len(bloque)
+        return b''.join(partes), None
+
+    async def _enviar_datos(self, escritor, datos, final):
+        """Escribe `datos` en el canal de datos; si es el último bloque lo cierra y lee la respuesta final"""
+        if datos:
+            escritor.write(datos)
+            await self._esperar(escritor.drain())
+        if final:
+            return await self._cerrar_datos(escritor)
+
+    async def _cerrar_datos(self, escritor, esperar_respuesta=True):
+        escritor.close()
+        try:
+            await self._esperar(escritor.wait_closed())
+        except OSError:
+            pass
+        if esperar_respuesta:
+            respuesta = self._verificar(await self._leer_respuesta())
+            if respuesta[:1] != '2':
+                raise ftplib.error_reply(respuesta)
+            return respuesta
+
+    def _transferir(self, tipo, comando, rest, mover_datos):
+        """
+        Esqueleto común de las transferencias: abre el canal de datos y delega en
+        `mover_datos(lector, escritor)`, que devuelve la respuesta final.
+        """
+        lector, escritor = self._ejecutar(self._abrir_datos(tipo, comando, rest))
+        try:
+            return mover_datos(lector, escritor)
+        except BaseException:
+            # La respuesta final queda pendiente en el canal de control: se descarta la conexión
+            try:
+                self._ejecutar(self._cerrar_datos(escritor, esperar_respuesta=False))
+            except Exception:
+                pass
+            self.close()
+            raise
+
+    def retrbinary(self, comando, callback, blocksize=8192, rest=None):
+        def recibir(lector, escritor):
+            while True:
+                bloque, respuesta = self._ejecutar(
+                    self._recibir(lector, escritor, max(blocksize, TAMANO_LECTURA_ASINCRONA)))
+                if bloque:
+                    callback(bloque)
+                if respuesta is not None:
+                    return respuesta
+        return self._transferir('I', comando, rest, recibir)
+
+    def retrlines(self, comando, callback=None):
+        if callback is None:
+            callback = ftplib.print_line
+
+        def recibir(lector, escritor):
+            resto = b''
+            while True:
+                bloque, respuesta = self._ejecutar(self._recibir(lector, escritor, TAMANO_LECTURA_ASINCRONA))
+                lineas = (resto + bloque).split(b'\n')
+                resto = lineas.pop()
+                for linea in lineas:
+                    callback(linea.rstrip(b'\r').decode(self.encoding))
+                if respuesta is not None:
+                    if resto:
+                        callback(resto.rstrip(b'\r').decode(self.encoding))
+                    return respuesta
+        return self._transferir('A', comando, None, recibir)
+
+    def storbinary(self, comando, fp, blocksize=8192, callback=None, rest=None):
+        tamano = max(blocksize, TAMANO_LECTURA_ASINCRONA)
+
+        def enviar(lector, escritor):
+            bloque = fp.read(tamano)
+            while True:
+                siguiente = fp.read(tamano) if bloque else b''
+                respuesta = self._ejecutar(self._enviar_datos(escritor, bloque, final=not siguiente))
+                if bloque and callback:
+                    callback(bloque)
+                if not siguiente:
+                    return respuesta
+                bloque = siguiente
+        return self._transferir('I', comando, rest, enviar)
+
+def enviar_comandos(ftp, comandos):
+    """
+    Envía varios comandos independientes y devuelve sus respuestas en orden.
+    
+    Con el backend asíncrono viajan juntos en una sola ida y vuelta; con ftplib se
+    envían uno a uno. Los errores FTP de cada comando se devuelven en la lista en
+    lugar de lanzarse; los errores de conexión sí se lanzan.
+    
+    Args:
+        ftp (FTP|FTPAsincrono): Conexión FTP activa
+        comandos (list): Comandos a enviar
+    
+    Returns:
+        list: Respuesta (str) o excepción ftplib de cada comando
+    """
+    if hasattr(ftp, 'sendcmds'):
+        return ftp.sendcmds(comandos)
+    respuestas = []
+    for comando in comandos:
+        try:
+            respuestas.append(ftp.sendcmd(comando))
+        except ftplib.Error as e:
+            respuestas.append(e)
+    return respuestas
+
+# ==============================================
+# CONEXIÓN SEGURA (FTPS)
+# ==============================================
+
+_contextos_tls = {}  # (ca, verificar) -> SSLContext compartido por todas las conexiones
+_lock_contextos_tls = threading.Lock()
+
+def obtener_contexto_tls(config_ftp):
+    """
+    Devuelve el SSLContext para la configuración FTP, creándolo una sola vez.
+    
+    Cargar los certificados raíz cuesta varios milisegundos y las sesiones TLS
+    solo pueden reanudarse dentro del mismo contexto, así que todas las
+    conexiones con la misma configuración comparten uno.
+    
+    Args:
+        config_ftp (dict): Sección "FTP" de la configuración ("tls_ca", "tls_verificar")
+    
+    Returns:
+        ssl.SSLContext: Contexto cliente
+    """
+    import ssl
+
+    clave = (config_ftp.get('tls_ca'), config_ftp.get('tls_verificar', True))
+    with _lock_contextos_tls:
+        contexto = _contextos_tls.get(clave)
+        if contexto is None:
+            contexto = ssl.create_default_context(cafile=clave[0])
+            if not clave[1]:
+                contexto.check_hostname = False
+                contexto.verify_mode = ssl.CERT_NONE
+            _contextos_tls[clave] = contexto
+        return contexto
+
+class FTPSeguro(FTP_TLS):
+    """
+    FTP_TLS con AUTH TLS explícito que reanuda la sesión TLS del canal de control
+    en cada canal de datos, en lugar de negociar un handshake completo por archivo
+    (además, servidores como vsftpd con require_ssl_reuse lo exigen).
+    
+    La última sesión de cada servidor se recuerda para que las conexiones nuevas
+    (reconexiones, o las que abre el pool) también la reanuden.
+    """
+
+    _sesiones = {}  # (contexto, servidor, puerto) -> última sesión TLS del canal de control
+    _lock_sesiones = threading.Lock()
+    reutilizar_sesion = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.canales_datos = 0
+        self.canales_reanudados = 0
+
+    def auth(self):
+        """Negocia TLS en el canal de control, reanudando la sesión anterior si la hay"""
+        respuesta = self.voidcmd('AUTH TLS')
+        with self._lock_sesiones:
+            sesion = self._sesiones.get((self.context, self.host, self.port)) if self.reutilizar_sesion else None
+        self.sock = self.context.wrap_socket(self.sock, server_hostname=self.host, session=sesion)
+        self.file = self.sock.makefile(mode='r', encoding=self.encoding)
+        return respuesta
+
+    def login(self, *args, **kwargs):
+        respuesta = super().login(*args, **kwargs)
+        # Con TLS 1.3 el ticket de sesión llega después del handshake: tras el login ya está
+        if self.reutilizar_sesion and self.sock.session is not None:
+            with self._lock_sesiones:
+                self._sesiones[(self.context, self.host, self.port)] = self.sock.session
+        return respuesta
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, tamano = FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            sesion = self.sock.session if self.reutilizar_sesion else None
+            conn = self.context.wrap_socket(conn, server_hostname=self.host, session=sesion)
+            self.canales_datos += 1
+            self.canales_reanudados += conn.session_reused
+        return conn, tamano
 
 # ==============================================
 # FUNCIONES DE CONEXIÓN Y CONFIGURACIÓN
@@ -117,18 +1470,31 @@ def conectar_ftp(config):
                       - ftp_server: Dirección del servidor
                       - ftp_user: Nombre de usuario
                       - ftp_password: Contraseña
+                      - ftp_puerto (opcional): Puerto del servidor (21 por defecto)
+                      - backend (opcional): 'ftplib' o 'asyncio'
+                      - tls (opcional): True para FTPS explícito (AUTH TLS + PROT P)
+                      - tls_ca, tls_verificar (opcionales): Certificado raíz propio
+                        o False para no verificar el del servidor
     
     Returns:
-        FTP: Objeto FTP conectado y autenticado
+        FTP: Objeto FTP conectado y autenticado (FTPAsincrono con el backend asyncio,
+             FTPSeguro con TLS)
     
     Raises:
         SocketTimeout: Si se excede el tiempo de conexión
-        ftplib.all_errors: Para otros errores relacionados con FTP
+        ftplib.all_errors: Para otros errores relacionados con FTP (incluidos los de TLS)
     """
     try:
-        ftp = FTP(timeout=TIMEOUT_FTP)
-        ftp.connect(config['FTP']['ftp_server'], timeout=TIMEOUT_FTP)
+        if config['FTP'].get('tls'):
+            ftp = FTPSeguro(context=obtener_contexto_tls(config['FTP']), timeout=TIMEOUT_FTP)
+        elif config['FTP'].get('backend', BACKEND_FTP) == 'asyncio':
+            ftp = FTPAsincrono(timeout=TIMEOUT_FTP)
+        else:
+            ftp = FTP(timeout=TIMEOUT_FTP)
+        ftp.connect(config['FTP']['ftp_server'], config['FTP'].get('ftp_puerto', 21), timeout=TIMEOUT_FTP)
         ftp.login(user=config['FTP']['ftp_user'], passwd=config['FTP']['ftp_password'])
+        if config['FTP'].get('tls'):
+            ftp.prot_p()  # Cifrar también los canales de datos
         ftp.set_pasv(True)
         return ftp
     except SocketTimeout:
@@ -152,15 +1518,39 @@ def leer_configuracion(ruta_config):
         Termina el programa si el archivo no existe o es inválido
     """
     try:
-        with open(ruta_config, 'r') as archivo:
-            config = json.load(archivo)
-            if 'FTP' not in config or not all(k in config['FTP'] for k in ['ftp_server', 'ftp_user', 'ftp_password']):
-                raise ValueError("Configuración incompleta o inválida")
-            return config
+        return cargar_configuracion(ruta_config)
     except Exception as e:
         print(f"❌ Error al leer configuración: {e}")
         sys.exit(1)
 
+def cargar_configuracion(ruta_config):
+    """
+    Lee y valida el archivo de configuración sin terminar el programa ante errores.
+    
+    Args:
+        ruta_config (str): Ruta completa al archivo de configuración
+    
+    Returns:
+        dict: Diccionario con la configuración cargada
+    
+    Raises:
+        ValueError: Si la configuración está incompleta
+        OSError, json.JSONDecodeError: Si el archivo no puede leerse
+    """
+    with open(ruta_config, 'r') as archivo:
+        config = json.load(archivo)
+    validar_configuracion(config)
+    return config
+
+def validar_configuracion(config):
+    """Verifica que la configuración tenga los datos de conexión FTP obligatorios"""
+    if 'FTP' not in config or not all(k in config['FTP'] for k in ['ftp_server', 'ftp_user', 'ftp_password']):
+        raise ValueError("Configuración incompleta o inválida")
+    if config['FTP'].get('backend', BACKEND_FTP) not in BACKENDS_FTP:
+        raise ValueError(f"Backend FTP desconocido: {config['FTP']['backend']}")
+    if config['FTP'].get('tls') and config['FTP'].get('backend', BACKEND_FTP) == 'asyncio':
+        raise ValueError("FTPS (tls) solo está disponible con el backend ftplib")
+
 def buscar_archivo_ancestro(nombre_archivo, directorio_actual):
     """
     Busca un archivo en el directorio actual y hacia arriba en la jerarquía.
@@ -197,7 +1587,12 @@ def leer_ignore_list(ruta_options):
             "ignore_list": [
                 "scb.log",
                 "scb.config",
-                "scb.options"
+                "scb.options",
+                "scb.journal",
+                "scb.snapshot",
+                "scb.metrics",
+                "scb.index",
+                "*.tmp"
                 ],
             "_explicacion": "Patrones de archivos/carpetas a ignorar:"
             "archivo.txt - se ignora el archivo por defecto "
@@ -228,15 +1623,30 @@ def leer_ignore_list(ruta_options):
             print(f"❌ Error leyendo {ruta_options}: {e}")
             return []
 
+def leer_opciones(ruta_options):
+    """
+    Lee el archivo de opciones completo.
+    
+    Args:
+        ruta_options (str): Ruta al archivo de opciones
+    
+    Returns:
+        dict: Opciones configuradas (vacío si el archivo no existe o es inválido)
+    """
+    try:
+        with open(ruta_options, 'r', encoding='utf-8') as archivo:
+            data = json.load(archivo)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
 def verificar_conexion_internet():
     """Verifica si hay conexión a internet"""
     try:
-        import urllib.request
-        import socket
-        socket.setdefaulttimeout(10)  # Timeout de 10 segundos
-        urllib.request.urlopen('http://google.com', timeout=10)
+        # Basta con abrir una conexión TCP: evita cargar urllib y no altera el timeout global
+        socket.create_connection(('google.com', 80), timeout=10).close()
         return True
-    except Exception:
+    except OSError:
         return False
 
 def esperar_reconexion():
@@ -263,12 +1673,49 @@ def esperar_reconexion():
     print("✅ Conexión a internet restablecida")
     return True
 
+def conexion_activa(ftp):
+    """Verifica si la conexión FTP sigue respondiendo"""
+    try:
+        ftp.voidcmd("NOOP")
+        return True
+    except (*ftplib.all_errors, gaierror, OSError, SocketTimeout):
+        return False
+
+def reconectar_ftp(config):
+    """
+    Espera a que vuelva internet y abre una nueva conexión FTP.
+
+    Args:
+        config (dict): Configuración FTP de la sesión
+
+    Returns:
+        FTP: Nueva conexión o None si no fue posible reconectar
+    """
+    if not esperar_reconexion():
+        return None
+    print("🔁 Reconectando con servidor FTP...")
+    try:
+        return conectar_ftp(config)
+    except Exception as e:
+        print(f"❌ Error al reconectar: {e}")
+        return None
+
 
 # ==============================================
 # FUNCIONES DE REGISTRO Y METADATOS
 # ==============================================
 
-def crear_scb_log(ftp, accion, descripcion, tipo="archivo", usuario=None):
+_usuario_actual = None
+
+def obtener_usuario():
+    """Nombre del usuario del sistema (se calcula una sola vez)"""
+    global _usuario_actual
+    if _usuario_actual is None:
+        import getpass
+        _usuario_actual = getpass.getuser()
+    return _usuario_actual
+
+def crear_scb_log(ftp, accion, descripcion, tipo="archivo", usuario=None, ruta_log='scb.log'):
     """
     Registra una acción en el archivo de log local y lo sincroniza con el servidor.
     
@@ -278,9 +1725,10 @@ def crear_scb_log(ftp, accion, descripcion, tipo="archivo", usuario=None):
         descripcion (str): Descripción del elemento afectado
         tipo (str): Tipo de elemento ("archivo" o "carpeta")
         usuario (str): Nombre de usuario (si no se proporciona, se detecta automáticamente)
+        ruta_log (str): Ruta del archivo de log local
     """
     if usuario is None:
-        usuario = getpass.getuser()
+        usuario = obtener_usuario()
     
     registro = HISTORIAL_TEMPLATE.format(
         fecha=datetime.now().strftime("%d-%m-%Y"),
@@ -292,11 +1740,11 @@ def crear_scb_log(ftp, accion, descripcion, tipo="archivo", usuario=None):
     )
     
     try:
-        with open('scb.log', 'a', encoding='utf-8') as archivo:
+        with open(ruta_log, 'a', encoding='utf-8') as archivo:
             archivo.write(registro + '\n')
         
         if ftp:
-            with open('scb.log', 'rb') as archivo:
+            with open(ruta_log, 'rb') as archivo:
                 ftp.storbinary('STOR scb.log', archivo)
     except Exception as e:
         print(f"⚠️ Error al escribir en log: {e}")
@@ -314,9 +1762,7 @@ def obtener_timestamp_ftp(ftp, ruta_ftp):
     """
     try:
         respuesta = ftp.sendcmd(f"MDTM {ruta_ftp}")
-        fecha_str = respuesta[4:].strip()
-        fecha_utc = datetime.strptime(fecha_str, "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
-        return fecha_utc.timestamp()
+        return convertir_fecha_ftp(respuesta[4:].strip())
     except ftplib.error_perm as e:
         if "550" in str(e):
             return None
@@ -325,6 +1771,74 @@ def obtener_timestamp_ftp(ftp, ruta_ftp):
         print(f"⚠️ Error obteniendo timestamp FTP: {e}")
         return None
 
+def convertir_fecha_ftp(fecha_str):
+    """
+    Convierte una fecha FTP (MDTM o hecho 'modify' de MLSD, AAAAMMDDHHMMSS[.fff]) a timestamp UTC.
+    """
+    fecha_utc = datetime.strptime(fecha_str[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+    return fecha_utc.timestamp()
+
+def obtener_hechos_remotos(ftp, ruta_ftp):
+    """
+    Obtiene los hechos MLST (type, size, modify...) de un elemento remoto.
+    
+    Args:
+        ftp (FTP): Conexión FTP activa
+        ruta_ftp (str): Ruta remota del elemento
+    
+    Returns:
+        dict: Hechos en minúsculas o None si el servidor no los informa
+    """
+    try:
+        respuesta = ftp.sendcmd(f"MLST {ruta_ftp}")
+    except ftplib.error_perm:
+        return None
+    for linea in respuesta.splitlines()[1:]:
+        if linea.startswith(' '):
+            hechos_str = linea.strip().partition(' ')[0]
+            return dict(h.split('=', 1) for h in hechos_str.lower().split(';') if '=' in h)
+    return None
+
+def recorrer_listado_remoto(sesion, ftp, ruta_ftp, procesar):
+    """
+    Recorre el listado de una carpeta remota línea a línea, sin acumularlo en memoria.
+    
+    Usa MLSD cuando el servidor lo admite (un solo comando devuelve tipo, tamaño y
+    fecha de cada elemento) y NLST en caso contrario. `procesar` se invoca mientras
+    el listado se recibe, por lo que no debe enviar comandos por la misma conexión.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP activa
+        ruta_ftp (str): Ruta remota de la carpeta
+        procesar (callable): Función (nombre, hechos); hechos es None si se listó con NLST
+    """
+    if sesion.soporta(ftp, 'MLST'):
+        def linea_mlsd(linea):
+            hechos_str, _, nombre = linea.partition(' ')
+            hechos = {}
+            for hecho in hechos_str.split(';'):
+                clave, _, valor = hecho.partition('=')
+                if clave:
+                    hechos[clave.lower()] = valor.lower() if clave.lower() == 'type' else valor
+            if nombre and hechos.get('type') not in ('cdir', 'pdir'):
+                procesar(nombre, hechos)
+        ftp.retrlines(f"MLSD {ruta_ftp}", linea_mlsd)
+    else:
+        ftp.retrlines(f"NLST {ruta_ftp}", lambda linea: procesar(os.path.basename(linea), None))
+
+def compactar_hechos(hechos):
+    """Reduce los hechos MLSD a una tupla (type, size, modify) para almacenarlos"""
+    if hechos is None:
+        return None
+    return (hechos.get('type'), hechos.get('size'), hechos.get('modify'))
+
+def expandir_hechos(compactos):
+    """Inversa de compactar_hechos"""
+    if compactos is None:
+        return None
+    return {clave: valor for clave, valor in zip(('type', 'size', 'modify'), compactos) if valor is not None}
+
 def obtener_timestamp_local(ruta_local):
     """
     Obtiene la fecha de modificación de un archivo local en formato timestamp UTC.
@@ -389,16 +1903,46 @@ def verificar_integridad_archivo(ruta_archivo, tamano_esperado=None):
 # FUNCIONES DE TRANSFERENCIA DE ARCHIVOS
 # ==============================================
 
-def descargar_archivo(ftp, ruta_ftp, ruta_local, nombre_archivo, contador):
+def preasignar_archivo(archivo, desplazamiento, tamano_total):
     """
-    Descarga un archivo desde el servidor FTP con verificación de integridad.
+    Reserva en disco el espacio que falta del archivo (posix_fallocate) para
+    evitar fragmentación y fallar pronto si no hay espacio.
     
-    Args:
+    Returns:
+        bool: True si se reservó espacio (el archivo debe recortarse al terminar)
+    """
+    if not tamano_total or tamano_total <= desplazamiento or not hasattr(os, 'posix_fallocate'):
+        return False
+    try:
+        os.posix_fallocate(archivo.fileno(), desplazamiento, tamano_total - desplazamiento)
+        return True
+    except OSError:
+        return False  # El sistema de archivos no lo admite
+
+def sincronizar_en_disco(ruta):
+    """Fuerza a disco un archivo o carpeta ya escritos (ignora plataformas que no lo permiten)"""
+    try:
+        descriptor = os.open(ruta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+def descargar_archivo(sesion, ftp, ruta_ftp, ruta_local, nombre_archivo, reanudar=False):
+    """
+    Descarga un archivo desde el servidor FTP con verificación de integridad.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
         ftp (FTP): Conexión FTP activa
         ruta_ftp (str): Ruta remota del archivo
         ruta_local (str): Ruta local de destino
         nombre_archivo (str): Nombre del archivo para registro
-        contador (list): Contador de descargas (usado para reconexión)
+        reanudar (bool): Reutilizar el temporal parcial de una ejecución interrumpida
     
     Returns:
         FTP: Objeto FTP (puede ser una nueva conexión)
@@ -408,68 +1952,102 @@ def descargar_archivo(ftp, ruta_ftp, ruta_local, nombre_archivo, contador):
         ValueError: Si el archivo descargado no pasa la verificación
         Exception: Para otros errores durante la transferencia
     """
-    global estadisticas
-    ruta_temp = ruta_local + '.tmp'
+    estadisticas = sesion.estadisticas
+    ruta_temp = ruta_local + SUFIJO_TEMPORAL
+    barra = None
     
     try:
-        # Verificar conexión antes de comenzar
+        # Verificar conexión, forzar modo binario y obtener el tamaño remoto (si está
+        # disponible) en un solo envío cuando el backend admite pipelining
+        comandos = ["NOOP", "TYPE I"]
+        if sesion.soporta(ftp, 'SIZE'):
+            comandos.append(f"SIZE {ruta_ftp}")
         try:
-            ftp.voidcmd("NOOP")
-        except (ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
+            respuestas = enviar_comandos(ftp, comandos)
+        except (*ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
             raise ConnectionError(f"Conexión perdida al iniciar descarga: {e}")
+        for respuesta in respuestas[:2]:
+            if isinstance(respuesta, Exception):
+                raise respuesta
 
-        # Forzar modo binario
-        ftp.voidcmd('TYPE I')
-        
-        # Obtener tamaño remoto (si está disponible)
         tamano_remoto = None
-        try:
-            if 'SIZE' in ftp.voidcmd('FEAT'):
-                tamano_remoto = ftp.size(ruta_ftp)
-        except ftplib.all_errors:
-            pass  # Continuar sin información de tamaño
+        if len(respuestas) > 2 and isinstance(respuestas[2], str) and respuestas[2][:3] == '213':
+            tamano_remoto = int(respuestas[2][3:].strip())  # Sin él se continúa sin información de tamaño
         
-        # Inicializar barra de progreso si el archivo es grande
-        barra = None
-        if tamano_remoto and tamano_remoto > UMBRAL_BARRA_PROGRESO:
-            barra = BarraProgreso(nombre_archivo, tamano_remoto)
+        # Registrar la transferencia en el progreso agregado
+        barra = BarraProgreso(nombre_archivo, tamano_remoto)
+        
+        # Reutilizar el temporal parcial de una ejecución interrumpida (REST). Con espacio
+        # preasignado el temporal ya tiene el tamaño final: solo vale lo anotado en el diario.
+        desplazamiento = 0
+        if reanudar and tamano_remoto and os.path.exists(ruta_temp):
+            desplazamiento = os.path.getsize(ruta_temp)
+            anotado = sesion.diario.avance('descarga', ruta_ftp) if sesion.diario else None
+            if anotado is not None:
+                desplazamiento = min(desplazamiento, anotado)
+            ts_ftp = obtener_timestamp_ftp(ftp, ruta_ftp)
+            if desplazamiento >= tamano_remoto or (ts_ftp and ts_ftp > os.path.getmtime(ruta_temp)):
+                desplazamiento = 0  # El temporal no corresponde a la versión remota actual
+            elif desplazamiento:
+                print(f"↩️ Reutilizando descarga parcial de {nombre_archivo} ({desplazamiento} bytes)")
+                barra.transferido = barra.previo = desplazamiento
         
         # Descargar a archivo temporal primero
-        with open(ruta_temp, 'wb') as archivo:
+        politica_fsync = sesion.opciones.get('fsync_descargas', FSYNC_DESCARGAS)
+        with open(ruta_temp, 'r+b' if desplazamiento else 'wb') as archivo:
+            archivo.truncate(desplazamiento)  # Descartar lo no anotado de un temporal reutilizado
+            archivo.seek(desplazamiento)
+            preasignado = preasignar_archivo(archivo, desplazamiento, tamano_remoto)
+            escritor = EscritorDescarga(archivo, en_segundo_plano=not tamano_remoto or
+                                        tamano_remoto - desplazamiento > TAMANO_BUFFER_ESCRITURA)
+            diario = sesion.diario
+            proximo_avance = time.monotonic() + INTERVALO_DIARIO
+
             def callback(data):
-                archivo.write(data)
-                if barra:
-                    barra.actualizar(len(data))
-                    
-            # Verificar conexión periódicamente durante la descarga
-            def verificar_conexion():
-                try:
-                    ftp.voidcmd("NOOP")
-                except (ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
-                    raise ConnectionError(f"Conexión perdida durante descarga: {e}")
-            
-            # Descargar en bloques con verificación de conexión
-            bloque = bytearray()
-            ftp.retrbinary(f"RETR {ruta_ftp}", lambda data: bloque.extend(data), blocksize=TAMANO_BLOQUE)
-            
-            # Verificar conexión después de cada bloque
-            if len(bloque) > 0:
-                verificar_conexion()
-                callback(bloque)
-                bloque.clear()
+                nonlocal proximo_avance
+                escritor.escribir(data)
+                barra.actualizar(len(data))
+                if diario and time.monotonic() >= proximo_avance:
+                    # Anotar hasta dónde se puede reanudar; los bytes ya están en disco al anotarlos
+                    diario.registrar_avance('descarga', ruta_ftp, desplazamiento + escritor.forzar_a_disco())
+                    proximo_avance = time.monotonic() + INTERVALO_DIARIO
+
+            try:
+                ftp.retrbinary(f"RETR {ruta_ftp}", callback, blocksize=TAMANO_BLOQUE,
+                               rest=desplazamiento or None)
+            finally:
+                escritor.cerrar()
+                if preasignado:
+                    # Recortar el espacio reservado que no llegó a escribirse
+                    archivo.truncate(desplazamiento + escritor.escritos)
+            if escritor.error is not None:
+                raise escritor.error
+
+            # Verificar que la conexión siga viva tras la transferencia
+            try:
+                ftp.voidcmd("NOOP")
+            except (*ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
+                raise ConnectionError(f"Conexión perdida durante descarga: {e}")
+
+            if politica_fsync == 'archivo':
+                archivo.flush()
+                os.fsync(archivo.fileno())
             
-        if barra:
-            barra.completado()
+        barra.completado()
         
         # Verificar integridad del archivo descargado
         if not verificar_integridad_archivo(ruta_temp, tamano_remoto):
             os.remove(ruta_temp)
             raise ValueError("Archivo descargado corrupto o incompleto")
         
-        # Reemplazar archivo existente si es necesario
-        if os.path.exists(ruta_local):
-            os.remove(ruta_local)
-        os.rename(ruta_temp, ruta_local)
+        # Reemplazar archivo existente de forma atómica
+        os.replace(ruta_temp, ruta_local)
+        if politica_fsync == 'archivo':
+            sincronizar_en_disco(os.path.dirname(ruta_local) or '.')
+        elif politica_fsync == 'lote':
+            sesion.pendientes_fsync.append(ruta_local)
+            if len(sesion.pendientes_fsync) >= LOTE_FSYNC:
+                sesion.sincronizar_disco()
         
         # Sincronizar timestamp con el servidor
         ts_ftp = obtener_timestamp_ftp(ftp, ruta_ftp)
@@ -477,21 +2055,21 @@ def descargar_archivo(ftp, ruta_ftp, ruta_local, nombre_archivo, contador):
             os.utime(ruta_local, (ts_ftp, ts_ftp))
         
         # Registrar operación y actualizar contador
-        crear_scb_log(ftp, "descargó", nombre_archivo)
-        contador[0] += 1
+        sesion.registrar(ftp, "descargó", nombre_archivo)
+        sesion.contador += 1
         estadisticas.archivos_descargados += 1
+        estadisticas.bytes_descargados += escritor.escritos
         if tamano_remoto:
-            estadisticas.tamano_transferido += tamano_remoto
+            estadisticas.tamano_transferido += tamano_remoto - desplazamiento
         
         # Reconectar si se alcanza el límite de descargas
-        if contador[0] >= DESCARGAS_PERMITIDAS_RECONEXION:
+        if sesion.contador >= DESCARGAS_PERMITIDAS_RECONEXION:
             try:
                 ftp.quit()
             except:
                 pass
-            config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-            ftp = conectar_ftp(config)
-            contador[0] = 0
+            ftp = conectar_ftp(sesion.config)
+            sesion.contador = 0
         
         return ftp
         
@@ -515,12 +2093,16 @@ def descargar_archivo(ftp, ruta_ftp, ruta_local, nombre_archivo, contador):
                 pass
         print(f"❌ Error al descargar {ruta_ftp}: {e}")
         raise
+    finally:
+        if barra:
+            barra.descartar()  # Sin efecto si ya se completó
 
-def subir_archivo(ftp, ruta_local, ruta_ftp, nombre_archivo):
+def subir_archivo(sesion, ftp, ruta_local, ruta_ftp, nombre_archivo):
     """
     Sube un archivo local al servidor FTP preservando metadatos.
     
     Args:
+        sesion (SyncSession): Sesión de sincronización en curso
         ftp (FTP): Conexión FTP activa
         ruta_local (str): Ruta local del archivo
         ruta_ftp (str): Ruta remota de destino
@@ -529,7 +2111,8 @@ def subir_archivo(ftp, ruta_local, ruta_ftp, nombre_archivo):
     Returns:
         bool: True si la operación fue exitosa
     """
-    global estadisticas
+    estadisticas = sesion.estadisticas
+    barra = None
     try:
         # Validar que el archivo local existe
         if not os.path.exists(ruta_local):
@@ -537,9 +2120,7 @@ def subir_archivo(ftp, ruta_local, ruta_ftp, nombre_archivo):
             return False
 
         tamano_local = os.path.getsize(ruta_local)
-        barra = None
-        if tamano_local > UMBRAL_BARRA_PROGRESO:
-            barra = BarraProgreso(nombre_archivo, tamano_local)
+        barra = BarraProgreso(nombre_archivo, tamano_local)
 
         # Obtener metadatos locales
         ts_local = os.path.getmtime(ruta_local)
@@ -549,20 +2130,17 @@ def subir_archivo(ftp, ruta_local, ruta_ftp, nombre_archivo):
         # Subir primero a archivo temporal remoto
         ruta_temp_ftp = ruta_ftp + '.tmp'
         with open(ruta_local, 'rb') as archivo:
-            def callback(data):
-                if barra:
-                    barra.actualizar(len(data))
-                return data
-                
-            ftp.storbinary(f'STOR {ruta_temp_ftp}', archivo, blocksize=TAMANO_BLOQUE, callback=callback)
+            ftp.storbinary(f'STOR {ruta_temp_ftp}', archivo, blocksize=TAMANO_BLOQUE,
+                           callback=lambda data: barra.actualizar(len(data)))
             
-        if barra:
-            barra.completado()
+        barra.completado()
 
         # Reemplazar archivo remoto existente
         try:
-            if ruta_ftp in ftp.nlst(os.path.dirname(ruta_ftp)):
+            try:
                 ftp.delete(ruta_ftp)
+            except ftplib.error_perm:
+                pass  # No existía
             ftp.rename(ruta_temp_ftp, ruta_ftp)
         except:
             print("❌ No se pudo renombrar archivo temporal remoto")
@@ -575,8 +2153,10 @@ def subir_archivo(ftp, ruta_local, ruta_ftp, nombre_archivo):
             print(f"⚠️ No se pudo actualizar fecha remota: {e}")
 
         # Registrar operación exitosa
-        crear_scb_log(ftp, "subió", nombre_archivo)
+        sesion.registrar(ftp, "subió", nombre_archivo)
+        sesion.carpetas_modificadas.add(posixpath.dirname(ruta_ftp))
         estadisticas.archivos_subidos += 1
+        estadisticas.bytes_subidos += tamano_local
         estadisticas.tamano_transferido += tamano_local
         return True
 
@@ -584,220 +2164,430 @@ def subir_archivo(ftp, ruta_local, ruta_ftp, nombre_archivo):
         estadisticas.errores += 1
         # Limpiar archivo temporal remoto si existe
         try:
-            if 'ruta_temp_ftp' in locals() and ruta_temp_ftp in ftp.nlst(os.path.dirname(ruta_temp_ftp)):
+            if 'ruta_temp_ftp' in locals():
                 ftp.delete(ruta_temp_ftp)
         except:
             pass
         
         print(f"❌ Error al subir {ruta_ftp}: {e}")
         return False
+    finally:
+        if barra:
+            barra.descartar()  # Sin efecto si ya se completó
 
 # ==============================================
 # FUNCIONES DE SINCRONIZACIÓN RECURSIVA
 # ==============================================
 
-def descargar_archivos_recursivo(ftp, ruta_ftp, ruta_local, ignore_list, contador=[0], reintentos=0):
+def procesar_elemento_descarga(sesion, ftp, ruta_f, ruta_l, nombre, cola, hechos=None):
+    """
+    Procesa un elemento remoto: si es carpeta la recorre, si es archivo lo descarga cuando cambió.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP activa
+        ruta_f (str): Ruta remota del elemento
+        ruta_l (str): Ruta local equivalente
+        nombre (str): Nombre del elemento
+        cola (ColaReintentos): Cola donde registrar elementos fallidos
+        hechos (dict): Hechos MLSD del elemento (None si se desconocen)
+    
+    Returns:
+        FTP: Conexión FTP (None si se perdió y no pudo recuperarse)
+    
+    Raises:
+        Exception: Si falla la transferencia del archivo o el listado de la carpeta
+    """
+    if hechos is not None and hechos.get('type') in ('dir', 'file'):
+        es_carpeta = hechos['type'] == 'dir'
+        sondeo = False
+    else:
+        # Sin hechos MLSD: probar si es directorio
+        hechos = None
+        sondeo = True
+        try:
+            ftp.cwd(ruta_f)
+            es_carpeta = True
+        except ftplib.error_perm:
+            es_carpeta = False
+
+    if not es_carpeta:
+        # Es archivo, procesar descarga
+        if hechos and 'modify' in hechos:
+            ts_ftp = convertir_fecha_ftp(hechos['modify'])  # Ya verificado al recorrer el listado
+        else:
+            ts_ftp = obtener_timestamp_ftp(ftp, ruta_f)
+            sesion.estadisticas.archivos_verificados += 1
+        ts_local = obtener_timestamp_local(ruta_l)
+
+        if necesita_sincronizacion(ts_local, ts_ftp):
+            print(f"🔽 Descargando: {ruta_f}")
+            if sesion.diario:
+                sesion.diario.planificar('descarga', ruta_f, ruta_l)
+            ftp = descargar_archivo(sesion, ftp, ruta_f, ruta_l, nombre)
+            if sesion.diario:
+                sesion.diario.completar('descarga', ruta_f)
+        else:
+            # Sin cambios: no se anota en el diario, al reanudar basta con volver a comparar
+            sesion.estadisticas.archivos_sin_cambios += 1
+        return ftp
+
+    # Es directorio, procesar recursivamente
+    if not os.path.exists(ruta_l):
+        os.makedirs(ruta_l)
+        sesion.registrar(ftp, "creó", nombre, "carpeta")
+        print(f"📂 Carpeta creada: {ruta_l}")
+        if sesion.instantanea:
+            sesion.instantanea.descartar(ruta_f)  # La copia local no existe: recorrer completa
+
+    ftp = descargar_archivos_recursivo(sesion, ftp, ruta_f, ruta_l, cola, hechos)
+    if ftp and sondeo:
+        ftp.cwd('..')
+    return ftp
+
+def descargar_archivos_recursivo(sesion, ftp, ruta_ftp, ruta_local, cola=None, hechos=None):
     """
-    Descarga recursiva de archivos desde servidor FTP con manejo robusto de conexión
+    Descarga recursiva de archivos desde servidor FTP con manejo robusto de conexión.
+    
+    El listado se consume línea a línea: cada elemento se clasifica localmente a
+    medida que llega y solo los que requieren acción (descargas, subcarpetas o
+    archivos sin fecha en el listado) se guardan, de forma compacta y con memoria
+    acotada, para procesarlos al terminar el listado.
+    
+    Los elementos que fallan se registran en la cola de reintentos y el recorrido
+    continúa con el siguiente elemento sobre una conexión nueva si hizo falta.
+    Si la carpeta no cambió desde la instantánea remota anterior se omite entera,
+    y con un perfil parcial solo se recorren las rutas incluidas.
     
     Args:
+        sesion (SyncSession): Sesión de sincronización en curso
         ftp (FTP): Conexión FTP activa
         ruta_ftp (str): Ruta remota inicial
         ruta_local (str): Ruta local de destino
-        ignore_list (list): Patrones de archivos a ignorar
-        contador (list): Contador de descargas para reconexión
-        reintentos (int): Número de reintentos actuales
+        cola (ColaReintentos): Cola donde registrar elementos fallidos
+        hechos (dict): Hechos MLSD de la propia carpeta (None si se desconocen)
         
     Returns:
-        FTP: Nueva conexión FTP si hubo reconexión
+        FTP: Conexión FTP vigente (None si se perdió y no pudo recuperarse)
+    
+    Raises:
+        Exception: Si no se puede listar la carpeta remota
     """
-    if reintentos > MAX_REINTENTOS:
-        print("\n❌ Máximo de reintentos alcanzado - Abortando descarga")
-        return None
+    if cola is None:
+        cola = ColaReintentos()
+    registrados_antes = cola.registrados
+
+    instantanea = sesion.instantanea if hechos else None
+    if instantanea and not sesion.verificacion_completa and instantanea.sin_cambios(ruta_ftp, hechos):
+        sesion.estadisticas.carpetas_omitidas += 1
+        return ftp
+
+    anteriores = instantanea.archivos_anteriores(ruta_ftp) if instantanea else {}
+    entradas = {}
+    completa = True
+    pendientes = ListaAcotada()
+
+    def clasificar(nombre, hechos_elemento):
+        nonlocal completa
+        ruta_f = os.path.join(ruta_ftp, nombre).replace('\\', '/')
+        ruta_l = os.path.join(ruta_local, nombre)
+
+        # Filtrar elementos a ignorar
+        if any(p in ['.', '..'] for p in ruta_f.split('/')):
+            return
+        if sesion.ignorado(nombre):
+            return
+        tipo = hechos_elemento.get('type') if hechos_elemento is not None else None
+        if sesion.fuera_de_perfil(ruta_l, None if tipo not in ('dir', 'file') else tipo == 'dir'):
+            completa = False  # Carpeta recorrida solo en parte: no se registra en la instantánea
+            return
+
+        es_archivo = tipo == 'file'
+        if es_archivo:
+            huella = [hechos_elemento.get('size'), hechos_elemento.get('modify')]
+            if len(entradas) < MAX_ENTRADAS_INSTANTANEA:
+                entradas[nombre] = huella
+            # Archivo idéntico al de la instantánea y presente en local: nada que comparar
+            if anteriores.get(nombre) == huella and os.path.exists(ruta_l):
+                sesion.estadisticas.archivos_verificados += 1
+                sesion.estadisticas.archivos_sin_cambios += 1
+                return
+
+        if sesion.diario and sesion.diario.esta_completado('descarga', ruta_f):
+            completa = completa and es_archivo
+            return
 
+        # Con la fecha del listado la comparación es local y no hace falta esperar
+        if es_archivo and 'modify' in hechos_elemento:
+            ts_ftp = convertir_fecha_ftp(hechos_elemento['modify'])
+            sesion.estadisticas.archivos_verificados += 1
+            if not necesita_sincronizacion(obtener_timestamp_local(ruta_l), ts_ftp):
+                sesion.estadisticas.archivos_sin_cambios += 1
+                return
+
+        pendientes.agregar((nombre, compactar_hechos(hechos_elemento)))
+
+    # Listar contenido remoto
     try:
-        # Verificar conexión FTP e internet
-        try:
-            ftp.voidcmd("NOOP")
-        except (ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
-            print(f"\n⚠️ Error de conexión: {str(e)}")
-            if not esperar_reconexion():
-                return None
-            
-            print("🔁 Reconectando con servidor FTP...")
+        recorrer_listado_remoto(sesion, ftp, ruta_ftp, clasificar)
+    except ftplib.error_perm as e:
+        pendientes.cerrar()
+        if "550" in str(e):  # No existe el directorio
+            return ftp
+        raise
+    except BaseException:
+        pendientes.cerrar()
+        raise
+
+    try:
+        for nombre, hechos_compactos in pendientes:
+            ruta_f = os.path.join(ruta_ftp, nombre).replace('\\', '/')
+            ruta_l = os.path.join(ruta_local, nombre)
+            hechos_elemento = expandir_hechos(hechos_compactos)
+            es_archivo = hechos_elemento is not None and hechos_elemento.get('type') == 'file'
+
+            # Sin conexión: registrar el resto para el reintento final
+            if ftp is None:
+                cola.agregar('descarga', ruta_f, ruta_l, nombre, "Conexión perdida")
+                continue
+
             try:
-                config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-                ftp = conectar_ftp(config)
-                contador[0] = 0
-                return descargar_archivos_recursivo(ftp, ruta_ftp, ruta_local, ignore_list, contador, reintentos+1)
+                ftp = procesar_elemento_descarga(sesion, ftp, ruta_f, ruta_l, nombre, cola, hechos_elemento)
+            except KeyboardInterrupt:
+                raise
             except Exception as e:
-                print(f"❌ Error al reconectar: {e}")
-                return None
+                print(f"⚠️ Error procesando {ruta_f}, se reintentará al final: {e}")
+                cola.agregar('descarga', ruta_f, ruta_l, nombre, e)
+                if not conexion_activa(ftp):
+                    ftp = sesion.reconectar()
+
+            # Una subcarpeta sin registrar impide omitir esta carpeta en la próxima descarga
+            if instantanea and not es_archivo and ruta_f not in instantanea.carpetas:
+                completa = False
+    finally:
+        pendientes.cerrar()
+
+    sin_fallos = ftp is not None and cola.registrados == registrados_antes
+
+    # Carpeta procesada sin fallos: no hace falta volver a recorrerla al reanudar
+    if sesion.diario and sin_fallos:
+        sesion.diario.completar('descarga', ruta_ftp)
+
+    if instantanea:
+        if sin_fallos and completa:
+            instantanea.registrar(ruta_ftp, hechos, entradas)
+        else:
+            instantanea.descartar(ruta_ftp)
+
+    return ftp
+
+def procesar_elemento_subida(sesion, ftp, ruta_l, ruta_f, nombre, cola):
+    """
+    Procesa un elemento local: si es carpeta la crea en el servidor y la recorre,
+    si es archivo lo sube cuando cambió.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP activa
+        ruta_l (str): Ruta local del elemento
+        ruta_f (str): Ruta remota equivalente
+        nombre (str): Nombre del elemento
+        cola (ColaReintentos): Cola donde registrar elementos fallidos
+    
+    Returns:
+        FTP: Conexión FTP (None si se perdió y no pudo recuperarse)
+    
+    Raises:
+        Exception: Si falla la subida del archivo o la creación de la carpeta
+    """
+    if os.path.isfile(ruta_l):
+        ts_local = obtener_timestamp_local(ruta_l)
+        ts_ftp = obtener_timestamp_ftp(ftp, ruta_f)
+        sesion.estadisticas.archivos_verificados += 1
+
+        if necesita_sincronizacion(ts_local, ts_ftp):
+            print(f"🔼 Subiendo: {ruta_f}")
+            if sesion.diario:
+                sesion.diario.planificar('subida', ruta_f, ruta_l)
+            if not subir_archivo(sesion, ftp, ruta_l, ruta_f, nombre):
+                raise RuntimeError("Subida fallida")
+            if sesion.diario:
+                sesion.diario.completar('subida', ruta_f)
+        else:
+            # Sin cambios: no se anota en el diario, al reanudar basta con volver a comparar
+            sesion.estadisticas.archivos_sin_cambios += 1
 
-        # Listar contenido remoto
+    elif os.path.isdir(ruta_l):
         try:
-            elementos = ftp.nlst(ruta_ftp)
-        except ftplib.error_perm as e:
-            if "550" in str(e):  # No existe el directorio
-                return ftp
-            raise
+            ftp.cwd(ruta_f)
+        except ftplib.error_perm:
+            ftp.mkd(ruta_f)
+            sesion.carpetas_modificadas.add(posixpath.dirname(ruta_f))
+            print(f"📂 Carpeta creada: {ruta_f}")
+            sesion.registrar(ftp, "creó", nombre, "carpeta")
+            sesion.estadisticas.carpetas_creadas += 1
+
+        ftp = subir_archivos_recursivo(sesion, ftp, ruta_l, ruta_f, cola)
+        if ftp:
+            ftp.cwd('..')
 
-        for elemento in elementos:
-            ruta_f = os.path.join(ruta_ftp, elemento).replace('\\', '/')
-            ruta_l = os.path.join(ruta_local, os.path.basename(elemento))
-            nombre = os.path.basename(ruta_f)
+    return ftp
+
+def subir_archivos_recursivo(sesion, ftp, ruta_local, ruta_ftp, cola=None):
+    """
+    Sube recursivamente archivos locales al servidor FTP con manejo robusto de conexión.
+    
+    Los elementos que fallan se registran en la cola de reintentos y el recorrido
+    continúa con el siguiente elemento sobre una conexión nueva si hizo falta.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP activa
+        ruta_local (str): Ruta local inicial
+        ruta_ftp (str): Ruta remota destino
+        cola (ColaReintentos): Cola donde registrar elementos fallidos
+    
+    Returns:
+        FTP: Conexión FTP vigente (None si se perdió y no pudo recuperarse)
+    """
+    if cola is None:
+        cola = ColaReintentos()
+    registrados_antes = cola.registrados
+
+    with os.scandir(ruta_local) as contenido:
+        for entrada in contenido:
+            nombre = entrada.name
+            ruta_l = entrada.path
+            ruta_f = os.path.join(ruta_ftp, nombre).replace('\\', '/')
 
-            # Filtrar elementos a ignorar
-            if any(p in ['.', '..'] for p in ruta_f.split('/')):
+            # Verificar si el archivo debe ser ignorado
+            if sesion.ignorado(nombre):
                 continue
-            if nombre == 'scb.log' or any(fnmatch.fnmatch(nombre, patron) for patron in ignore_list):
+            if sesion.fuera_de_perfil(ruta_l, entrada.is_dir()):
+                continue
+            if sesion.diario and sesion.diario.esta_completado('subida', ruta_f):
                 continue
 
-            try:
-                # Probar si es directorio
-                try:
-                    ftp.cwd(ruta_f)
-                    # Es directorio, procesar recursivamente
-                    if not os.path.exists(ruta_l):
-                        os.makedirs(ruta_l)
-                        crear_scb_log(ftp, "creó", nombre, "carpeta")
-                        print(f"📂 Carpeta creada: {ruta_l}")
-                    
-                    ftp = descargar_archivos_recursivo(ftp, ruta_f, ruta_l, ignore_list, contador)
-                    ftp.cwd('..')
-                except ftplib.error_perm:
-                    # Es archivo, procesar descarga
-                    ts_ftp = obtener_timestamp_ftp(ftp, ruta_f)
-                    ts_local = obtener_timestamp_local(ruta_l)
-
-                    if necesita_sincronizacion(ts_local, ts_ftp):
-                        print(f"🔽 Descargando: {ruta_f}")
-                        ftp = descargar_archivo(ftp, ruta_f, ruta_l, nombre, contador)
+            # Sin conexión: registrar el resto para el reintento final
+            if ftp is None:
+                cola.agregar('subida', ruta_f, ruta_l, nombre, "Conexión perdida")
+                continue
 
+            try:
+                ftp = procesar_elemento_subida(sesion, ftp, ruta_l, ruta_f, nombre, cola)
             except KeyboardInterrupt:
                 raise
-            except (ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
-                print(f"⚠️ Error de conexión procesando {ruta_f}: {e}")
-                if esperar_reconexion():
-                    config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-                    ftp = conectar_ftp(config)
-                    contador[0] = 0
-                    return descargar_archivos_recursivo(ftp, ruta_ftp, ruta_local, ignore_list, contador, reintentos+1)
-                else:
-                    return None
             except Exception as e:
-                print(f"⚠️ Error no relacionado con conexión procesando {ruta_f}: {e}")
-                continue
+                print(f"⚠️ Error procesando {ruta_l}, se reintentará al final: {e}")
+                cola.agregar('subida', ruta_f, ruta_l, nombre, e)
+                if not conexion_activa(ftp):
+                    ftp = sesion.reconectar()
 
-        return ftp
+    # Carpeta procesada sin fallos: no hace falta volver a recorrerla al reanudar
+    if sesion.diario and ftp and cola.registrados == registrados_antes:
+        sesion.diario.completar('subida', ruta_ftp)
 
-    except KeyboardInterrupt:
-        raise
-    except Exception as e:
-        print(f"\n❌ Error en descarga recursiva: {e}")
-        if reintentos < MAX_REINTENTOS:
-            print(f"🔄 Reintentando ({reintentos+1}/{MAX_REINTENTOS})...")
-            if esperar_reconexion():
-                config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-                ftp = conectar_ftp(config)
-                contador[0] = 0
-                return descargar_archivos_recursivo(ftp, ruta_ftp, ruta_local, ignore_list, contador, reintentos+1)
-        return None
-    
-def subir_archivos_recursivo(ftp, ruta_local, ruta_ftp, ignore_list, reintentos=0):
+    return ftp
+
+def procesar_cola_reintentos(sesion, ftp, cola):
     """
-    Sube recursivamente archivos locales al servidor FTP con manejo robusto de conexión
+    Reintenta los elementos fallidos respetando la espera de cada uno.
     
     Args:
-        ftp (FTP): Conexión FTP activa
-        ruta_local (str): Ruta local inicial
-        ruta_ftp (str): Ruta remota destino
-        ignore_list (list): Patrones de archivos a ignorar
-        reintentos (int): Número de reintentos actuales
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP (puede ser None)
+        cola (ColaReintentos): Cola con los elementos a reintentar
+    
+    Returns:
+        FTP: Conexión FTP vigente (None si no pudo recuperarse)
     """
-    if reintentos > MAX_REINTENTOS:
-        print("\n❌ Máximo de reintentos alcanzado - Abortando subida")
-        return
+    if not cola.pendientes:
+        return ftp
+
+    print(f"\n🔄 Reintentando {len(cola.pendientes)} elemento(s) fallido(s)...")
+    while cola.pendientes:
+        elemento = cola.siguiente()
+        sesion.estadisticas.reintentos += 1
+
+        if ftp is None or not conexion_activa(ftp):
+            ftp = sesion.reconectar()
+            if ftp is None:
+                cola.pendientes.append(elemento)
+                cola.abandonar_pendientes("Sin conexión con el servidor")
+                break
 
-    try:
-        # Verificar conexión antes de comenzar
         try:
-            ftp.voidcmd("NOOP")
-        except (ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
-            print(f"\n⚠️ Error de conexión: {str(e)}")
-            if not esperar_reconexion():
-                return
-            
-            print("🔁 Reconectando con servidor FTP...")
-            config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-            ftp = conectar_ftp(config)
-            return subir_archivos_recursivo(ftp, ruta_local, ruta_ftp, ignore_list, reintentos+1)
+            if elemento.operacion == 'descarga':
+                ftp = procesar_elemento_descarga(sesion, ftp, elemento.ruta_ftp, elemento.ruta_local,
+                                                 elemento.nombre, cola)
+            else:
+                ftp = procesar_elemento_subida(sesion, ftp, elemento.ruta_local, elemento.ruta_ftp,
+                                               elemento.nombre, cola)
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            print(f"⚠️ Reintento {elemento.intentos + 1}/{MAX_INTENTOS_COLA} fallido para {elemento.nombre}: {e}")
+            cola.registrar_fallo(elemento, e)
 
-        for nombre in os.listdir(ruta_local):
-            ruta_l = os.path.join(ruta_local, nombre)
-            ruta_f = os.path.join(ruta_ftp, nombre).replace('\\', '/')
+    return ftp
 
-            # Verificar si el archivo debe ser ignorado
-            if any(fnmatch.fnmatch(nombre, patron) for patron in ignore_list):
-                continue
+def retomar_pendientes(sesion, ftp, operacion, cola):
+    """
+    Ejecuta las transferencias que el diario dejó planificadas sin completar, sin
+    volver a compararlas. Reutiliza los temporales locales de descargas parciales y
+    elimina los temporales remotos cuyo archivo local ya no existe.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP activa
+        operacion (str): 'descarga' o 'subida'
+        cola (ColaReintentos): Cola donde registrar elementos fallidos
+    
+    Returns:
+        FTP: Conexión FTP vigente (None si se perdió y no pudo recuperarse)
+    """
+    for ruta_f, ruta_l in sesion.diario.pendientes(operacion):
+        nombre = os.path.basename(ruta_f)
+        if ftp is None:
+            cola.agregar(operacion, ruta_f, ruta_l, nombre, "Conexión perdida")
+            continue
 
-            if os.path.isfile(ruta_l):
-                # Verificar conexión antes de cada subida
-                try:
-                    ftp.voidcmd("NOOP")
-                except (ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
-                    print(f"\n⚠️ Error de conexión: {str(e)}")
-                    if not esperar_reconexion():
-                        return
-                    
-                    print("🔁 Reconectando con servidor FTP...")
-                    config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-                    ftp = conectar_ftp(config)
-                    return subir_archivos_recursivo(ftp, ruta_local, ruta_ftp, ignore_list, reintentos+1)
-
-                ts_local = obtener_timestamp_local(ruta_l)
-                ts_ftp = obtener_timestamp_ftp(ftp, ruta_f)
-
-                if necesita_sincronizacion(ts_local, ts_ftp):
-                    print(f"🔼 Subiendo: {ruta_f}")
-                    if not subir_archivo(ftp, ruta_l, ruta_f, nombre):
-                        continue
-
-            elif os.path.isdir(ruta_l):
+        try:
+            if operacion == 'descarga':
+                print(f"↩️ Retomando descarga: {ruta_f}")
+                ftp = descargar_archivo(sesion, ftp, ruta_f, ruta_l, nombre, reanudar=True)
+            elif os.path.isfile(ruta_l):
+                print(f"↩️ Retomando subida: {ruta_f}")
+                if not subir_archivo(sesion, ftp, ruta_l, ruta_f, nombre):
+                    raise RuntimeError("Subida fallida")
+            else:
+                # El archivo local ya no existe: limpiar el temporal remoto huérfano
                 try:
-                    ftp.cwd(ruta_f)
-                except:
-                    try:
-                        ftp.mkd(ruta_f)
-                        print(f"📂 Carpeta creada: {ruta_f}")
-                        crear_scb_log(ftp, "creó", nombre, "carpeta")
-                        estadisticas.carpetas_creadas += 1
-                    except Exception as e:
-                        print(f"❌ Error creando carpeta {ruta_f}: {e}")
-                        continue
-
-                subir_archivos_recursivo(ftp, ruta_l, ruta_f, ignore_list)
-                ftp.cwd('..')
+                    ftp.delete(ruta_f + '.tmp')
+                    print(f"🧹 Temporal remoto eliminado: {ruta_f}.tmp")
+                except ftplib.error_perm:
+                    pass
+            sesion.diario.completar(operacion, ruta_f)
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            print(f"⚠️ Error retomando {ruta_f}, se reintentará al final: {e}")
+            cola.agregar(operacion, ruta_f, ruta_l, nombre, e)
+            if not conexion_activa(ftp):
+                ftp = sesion.reconectar()
+
+    return ftp
 
-    except KeyboardInterrupt:
-        raise  # Solo propagamos la interrupción
-    except Exception as e:
-        print(f"\n❌ Error en subida recursiva: {e}")
-        if reintentos < MAX_REINTENTOS:
-            print(f"🔄 Reintentando ({reintentos+1}/{MAX_REINTENTOS})...")
-            if esperar_reconexion():
-                config = leer_configuracion(buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd()))
-                ftp = conectar_ftp(config)
-                return subir_archivos_recursivo(ftp, ruta_local, ruta_ftp, ignore_list, reintentos+1)
 # ==============================================
 # FUNCIONES DE ESTRUCTURA DE CARPETAS
 # ==============================================
 
-def crear_estructura_carpetas_ftp(ftp, origen_dir, carpeta_principal, destino_ftp='/'):
+def crear_estructura_carpetas_ftp(sesion, ftp, origen_dir, carpeta_principal, destino_ftp='/'):
     """
     Crea la estructura de carpetas equivalente en el servidor FTP.
     
     Args:
+        sesion (SyncSession): Sesión de sincronización en curso
         ftp (FTP): Conexión FTP activa
         origen_dir (str): Ruta local del directorio a replicar
         carpeta_principal (str): Ruta local del directorio base
@@ -806,7 +2596,6 @@ def crear_estructura_carpetas_ftp(ftp, origen_dir, carpeta_principal, destino_ft
     Returns:
         str: Ruta FTP completa creada
     """
-    global estadisticas
     ruta_relativa = os.path.relpath(origen_dir, carpeta_principal)
     carpetas = ruta_relativa.split(os.sep)
     ruta_actual_ftp = destino_ftp
@@ -820,158 +2609,1137 @@ def crear_estructura_carpetas_ftp(ftp, origen_dir, carpeta_principal, destino_ft
             except:
                 try:
                     ftp.mkd(ruta_actual_ftp)
-                    crear_scb_log(ftp, "creó", carpeta, "carpeta")
+                    sesion.carpetas_modificadas.add(posixpath.dirname(ruta_actual_ftp))
+                    sesion.registrar(ftp, "creó", carpeta, "carpeta")
                     print(f"📂 Carpeta creada: {ruta_actual_ftp}")
-                    estadisticas.carpetas_creadas += 1
+                    sesion.estadisticas.carpetas_creadas += 1
                 except Exception as e:
                     print(f"❌ Error creando carpeta {ruta_actual_ftp}: {e}")
                     raise
 
     return ruta_actual_ftp
 
+def propagar_modificaciones_remotas(sesion, ftp):
+    """
+    Actualiza la fecha de las carpetas remotas con cambios subidos y de sus
+    ancestros hasta la carpeta remota de la raíz (incluida), sin tocar carpetas
+    del servidor fuera de ella. Así la instantánea remota de cualquier cliente
+    detecta el cambio desde la raíz y no omite el subárbol que lo contiene.
+    Solo se hace si la raíz usa la instantánea ("verificacion_completa_cada");
+    si el servidor no lo permite se desactiva la omisión de carpetas.
+    
+    Args:
+        sesion (SyncSession): Sesión de sincronización en curso
+        ftp (FTP): Conexión FTP activa
+    """
+    if not sesion.usa_instantanea() or ftp is None:
+        sesion.carpetas_modificadas.clear()
+        return
+
+    base = posixpath.normpath(sesion.ruta_remota_base or '/')
+    carpetas = set()
+    for carpeta in sesion.carpetas_modificadas:
+        carpeta = posixpath.normpath(carpeta)
+        if carpeta != base and not carpeta.startswith(base.rstrip('/') + '/'):
+            continue  # Fuera de la raíz remota
+        while carpeta not in carpetas:
+            carpetas.add(carpeta)
+            if carpeta == base:
+                break
+            carpeta = posixpath.dirname(carpeta)
+    sesion.carpetas_modificadas.clear()
+
+    fecha_ftp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+    for carpeta in sorted(carpetas, key=len, reverse=True):
+        try:
+            ftp.sendcmd(f"MFMT {fecha_ftp} {carpeta}")
+        except (*ftplib.all_errors, gaierror, OSError, SocketTimeout) as e:
+            # Sin la fecha propagada otros clientes omitirían el cambio: dejar de omitir carpetas
+            sesion.desactivar_omision(f"No se pudo actualizar la fecha de {carpeta}: {e}")
+            break
+
 # ==============================================
-# FUNCIONES PRINCIPALES DE OPERACIÓN
+# EXPORTACIÓN DE MÉTRICAS
 # ==============================================
 
-def bajar_archivos():
+def metricas_ejecucion(resultado):
     """
-    Función principal para descargar archivos desde el servidor FTP.
+    Resume una ejecución en un registro plano apto para JSON y Prometheus.
+    
+    Args:
+        resultado (ResultadoSincronizacion): Resultado de la operación
+    
+    Returns:
+        dict: Métricas de la ejecución
+    """
+    e = resultado.estadisticas
+    return {
+        "fecha": datetime.fromtimestamp(e.inicio or time.time(), timezone.utc).isoformat(),
+        "inicio": e.inicio,
+        "raiz": resultado.raiz,
+        "operacion": resultado.operacion,
+        "exitoso": resultado.exitoso,
+        "duracion_segundos": round(e.duracion, 3),
+        "fases_segundos": {fase: round(segundos, 3) for fase, segundos in e.tiempos_fase.items()},
+        "bytes_descargados": e.bytes_descargados,
+        "bytes_subidos": e.bytes_subidos,
+        "archivos_descargados": e.archivos_descargados,
+        "archivos_subidos": e.archivos_subidos,
+        "archivos_verificados": e.archivos_verificados,
+        "archivos_sin_cambios": e.archivos_sin_cambios,
+        "carpetas_creadas": e.carpetas_creadas,
+        "carpetas_omitidas": e.carpetas_omitidas,
+        "reintentos": e.reintentos,
+        "reconexiones": e.reconexiones,
+        "errores": e.errores,
+        "fallidos": len(resultado.fallidos),
+        "error": resultado.error,
+    }
+
+def exportar_metricas_json(registro, ruta):
+    """Agrega el registro como una línea JSON al final del log de métricas"""
+    with open(ruta, 'a', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+def exportar_metricas_prometheus(registro, carpeta):
+    """
+    Escribe el registro en formato de texto de Prometheus para el textfile
+    collector de node_exporter. Hay un archivo por raíz y operación, reemplazado
+    de forma atómica en cada ejecución.
+    
+    Args:
+        registro (dict): Métricas generadas por metricas_ejecucion
+        carpeta (str): Carpeta vigilada por el textfile collector
+    
+    Returns:
+        str: Ruta del archivo escrito
     """
-    global estadisticas
-    estadisticas = Estadisticas()
-    ftp = None  # Inicializar para el bloque finally
+    def etiqueta(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    base = f'raiz="{etiqueta(registro["raiz"])}",operacion="{registro["operacion"]}"'
+    metricas = [
+        ("scbox_ultima_ejecucion_timestamp_segundos", "Inicio de la última ejecución (epoch)",
+         [("", registro["inicio"] or 0)]),
+        ("scbox_exito", "1 si la última ejecución terminó sin errores",
+         [("", int(registro["exitoso"]))]),
+        ("scbox_duracion_segundos", "Duración total de la última ejecución",
+         [("", registro["duracion_segundos"])]),
+        ("scbox_fase_duracion_segundos", "Duración de cada fase de la última ejecución",
+         [(f',fase="{fase}"', segundos) for fase, segundos in registro["fases_segundos"].items()]),
+        ("scbox_bytes", "Bytes transferidos en la última ejecución",
+         [(',direccion="descarga"', registro["bytes_descargados"]),
+          (',direccion="subida"', registro["bytes_subidos"])]),
+        ("scbox_archivos", "Archivos por estado en la última ejecución",
+         [(',estado="descargados"', registro["archivos_descargados"]),
+          (',estado="subidos"', registro["archivos_subidos"]),
+          (',estado="verificados"', registro["archivos_verificados"]),
+          (',estado="sin_cambios"', registro["archivos_sin_cambios"]),
+          (',estado="fallidos"', registro["fallidos"])]),
+        ("scbox_carpetas", "Carpetas por estado en la última ejecución",
+         [(',estado="creadas"', registro["carpetas_creadas"]),
+          (',estado="omitidas"', registro["carpetas_omitidas"])]),
+        ("scbox_reintentos", "Reintentos de la cola en la última ejecución", [("", registro["reintentos"])]),
+        ("scbox_reconexiones", "Reconexiones en la última ejecución", [("", registro["reconexiones"])]),
+        ("scbox_errores", "Errores en la última ejecución", [("", registro["errores"])]),
+    ]
+    lineas = []
+    for nombre, ayuda, muestras in metricas:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} gauge")
+        for etiquetas, valor in muestras:
+            lineas.append(f"{nombre}{{{base}{etiquetas}}} {valor}")
+
+    identificador = ''.join(c if c.isalnum() else '_' for c in registro["raiz"]).strip('_')
+    ruta = os.path.join(carpeta, f"scbox_{identificador}_{registro['operacion']}.prom")
+    # El collector puede leer en cualquier momento: escribir aparte y reemplazar
+    ruta_temp = ruta + '.tmp'
+    with open(ruta_temp, 'w', encoding='utf-8') as archivo:
+        archivo.write('\n'.join(lineas) + '\n')
+    os.replace(ruta_temp, ruta)
+    return ruta
+
+def exportar_metricas(sesion, resultado):
+    """
+    Exporta las métricas de una ejecución según las opciones de la raíz:
+    "metricas_json" (true o ruta del log JSON) y "metricas_prometheus" (carpeta
+    del textfile collector). Un fallo al exportar nunca interrumpe la sincronización.
     
+    Args:
+        sesion (SyncSession): Sesión que ejecutó la operación
+        resultado (ResultadoSincronizacion): Resultado de la operación
+    """
+    destino_json = sesion.opciones.get('metricas_json')
+    carpeta_prometheus = sesion.opciones.get('metricas_prometheus')
+    if not destino_json and not carpeta_prometheus:
+        return
+
+    registro = metricas_ejecucion(resultado)
     try:
-        # Buscar archivo de configuración
-        ruta_config = buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd())
-        if not ruta_config:
-            print("❌ Archivo de configuración no encontrado")
-            return
+        if destino_json:
+            ruta = destino_json if isinstance(destino_json, str) else ARCHIVO_METRICAS
+            exportar_metricas_json(registro, os.path.join(sesion.raiz, os.path.expanduser(ruta)))
+        if carpeta_prometheus:
+            exportar_metricas_prometheus(registro, os.path.join(sesion.raiz, os.path.expanduser(carpeta_prometheus)))
+    except OSError as e:
+        print(f"⚠️ No se pudieron exportar las métricas: {e}")
+
+# ==============================================
+# ÍNDICE DE HASHES LOCALES
+# ==============================================
 
-        # Obtener lista de archivos a ignorar
-        directorio_base = os.path.dirname(ruta_config)
-        ruta_opciones = os.path.join(directorio_base, ARCHIVO_OPTIONS)
-        ignore_list = leer_ignore_list(ruta_opciones) if ruta_opciones else []
+def calcular_hash_archivo(ruta, avance=None):
+    """
+    Calcula el hash (ALGORITMO_HASH) del contenido de un archivo local.
+    
+    Los archivos desde UMBRAL_MMAP_HASH se mapean en memoria y el resto se lee en
+    bloques grandes sobre un búfer reutilizado. hashlib libera el GIL mientras
+    procesa cada bloque, así que varios hilos aprovechan varios núcleos.
+    
+    Args:
+        ruta (str): Archivo a leer
+        avance (callable): Función que recibe los bytes procesados en cada bloque (opcional)
+    
+    Returns:
+        str: Hash en hexadecimal
+    
+    Raises:
+        OSError: Si no se puede leer el archivo
+    """
+    import hashlib
+
+    calculo = hashlib.new(ALGORITMO_HASH)
+    with open(ruta, 'rb', buffering=0) as archivo:
+        tamano = os.fstat(archivo.fileno()).st_size
+        if tamano >= UMBRAL_MMAP_HASH:
+            import mmap
+            with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa, memoryview(mapa) as vista:
+                for inicio in range(0, len(vista), TAMANO_LECTURA_HASH):
+                    bloque = vista[inicio:inicio + TAMANO_LECTURA_HASH]
+                    calculo.update(bloque)
+                    if avance:
+                        avance(len(bloque))
+                    bloque.release()
+        else:
+            bufer = bytearray(TAMANO_LECTURA_HASH)
+            vista = memoryview(bufer)
+            while True:
+                leidos = archivo.readinto(bufer)
+                if not leidos:
+                    break
+                calculo.update(vista[:leidos])
+                if avance:
+                    avance(leidos)
+    return calculo.hexdigest()
+
+def recorrer_archivos_locales(sesion, carpeta):
+    """
+    Recorre los archivos locales bajo `carpeta` con las mismas exclusiones que el
+    recorrido de subida (SyncSession.ignorado y SyncSession.fuera_de_perfil).
+    
+    Args:
+        sesion (SyncSession): Sesión de la raíz
+        carpeta (str): Carpeta local inicial
+    
+    Yields:
+        os.DirEntry: Cada archivo encontrado
+    """
+    carpetas = [carpeta]
+    while carpetas:
+        actual = carpetas.pop()
+        try:
+            with os.scandir(actual) as contenido:
+                entradas = list(contenido)
+        except OSError as e:
+            print(f"⚠️ No se pudo leer la carpeta {actual}: {e}")
+            continue
+        for entrada in entradas:
+            nombre = entrada.name
+            if sesion.ignorado(nombre):
+                continue
+            es_carpeta = entrada.is_dir()
+            if sesion.fuera_de_perfil(entrada.path, es_carpeta):
+                continue
+            if es_carpeta:
+                carpetas.append(entrada.path)
+            elif entrada.is_file():
+                yield entrada
 
-        # Conectar al servidor FTP
-        config = leer_configuracion(ruta_config)
-        ftp = conectar_ftp(config)
-        if not ftp:
-            print("❌ No se pudo conectar al servidor")
+def indexar_local(sesion, ruta_local):
+    """
+    Actualiza el índice de hashes (scb.index) de los archivos bajo `ruta_local`.
+    
+    Primero recorre el árbol marcando en el índice los archivos sin cambios y
+    separando los que cambiaron (en una ListaAcotada); al terminar el recorrido
+    elimina las entradas de la carpeta que quedaron sin marcar (archivos que ya no
+    existen). Después calcula los hashes pendientes en un grupo de hilos. Los
+    cambios se confirman cada INTERVALO_GUARDADO_INDICE segundos para que una
+    interrupción no pierda lo ya calculado. La memoria no depende del tamaño de
+    la raíz.
+    
+    Args:
+        sesion (SyncSession): Sesión de la raíz
+        ruta_local (str): Carpeta local a indexar
+    
+    Returns:
+        dict: Totales ('archivos', 'calculados', 'bytes', 'errores', 'segundos')
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    inicio = time.perf_counter()
+    indice = sesion.indice_local()
+    hilos = max(1, int(sesion.opciones.get('hilos_hash') or HILOS_HASH))
+    prefijo = os.path.relpath(ruta_local, sesion.raiz).replace(os.sep, '/')
+    prefijo = '' if prefijo == '.' else prefijo + '/'
+
+    print(f"🧮 Indexando archivos locales en {ruta_local}")
+    marca = time.time_ns()  # Identifica las entradas vistas en este indexado
+    archivos = 0
+    pendientes = ListaAcotada()
+    bytes_pendientes = 0
+    ultimo_guardado = time.monotonic()
+    try:
+        for entrada in recorrer_archivos_locales(sesion, ruta_local):
+            estado = entrada.stat()
+            ruta_relativa = os.path.relpath(entrada.path, sesion.raiz).replace(os.sep, '/')
+            archivos += 1
+            clave = [estado.st_size, estado.st_mtime_ns, entrada.inode()]
+            if indice.hash_vigente(ruta_relativa, *clave, marca=marca) is None:
+                pendientes.agregar([ruta_relativa, entrada.path] + clave)
+                bytes_pendientes += estado.st_size
+            if time.monotonic() - ultimo_guardado >= INTERVALO_GUARDADO_INDICE:
+                indice.guardar()
+                ultimo_guardado = time.monotonic()
+        # Recorrido completo: lo que quedó sin marcar ya no existe (o cambió y se registrará de nuevo)
+        indice.barrer(prefijo, marca)
+    except BaseException:
+        pendientes.cerrar()
+        raise
+
+    totales = {'archivos': archivos, 'calculados': 0, 'bytes': 0, 'errores': 0, 'segundos': 0.0}
+    barra = BarraProgreso(ARCHIVO_INDICE, bytes_pendientes)
+    lock_avance = threading.Lock()
+    cancelado = threading.Event()
+
+    def avance(leidos):
+        if cancelado.is_set():
+            raise InterruptedError("Indexado interrumpido")  # Corta también los archivos grandes en curso
+        with lock_avance:
+            barra.actualizar(leidos)
+
+    def calcular(tarea):
+        ruta_relativa, ruta, tamano, mtime_ns, inodo = tarea
+        try:
+            hash_ = calcular_hash_archivo(ruta, avance)
+            estado = os.stat(ruta)
+        except OSError as e:
+            if not cancelado.is_set():
+                print(f"⚠️ No se pudo leer {ruta}: {e}")
+            return tarea, None
+        if (estado.st_size, estado.st_mtime_ns) != (tamano, mtime_ns):
+            return tarea, ''  # Cambió mientras se leía: se calculará en el próximo indexado
+        return tarea, hash_
+
+    def registrar(futuro):
+        tarea, hash_ = futuro.result()
+        if hash_ is None:
+            totales['errores'] += 1
+        elif hash_:
+            ruta_relativa, _, tamano, mtime_ns, inodo = tarea
+            indice.registrar(ruta_relativa, tamano, mtime_ns, inodo, hash_, marca)
+            totales['calculados'] += 1
+            totales['bytes'] += tamano
+
+    ejecutor = ThreadPoolExecutor(max_workers=hilos)
+    completado = False
+    try:
+        en_vuelo = deque()
+        for tarea in pendientes:
+            en_vuelo.append(ejecutor.submit(calcular, tarea))
+            if len(en_vuelo) >= hilos * 4:  # Limita los archivos en espera, no solo los hilos
+                registrar(en_vuelo.popleft())
+                if time.monotonic() - ultimo_guardado >= INTERVALO_GUARDADO_INDICE:
+                    indice.guardar()
+                    ultimo_guardado = time.monotonic()
+        while en_vuelo:
+            registrar(en_vuelo.popleft())
+        completado = True
+    finally:
+        if not completado:
+            cancelado.set()
+        ejecutor.shutdown(wait=True, cancel_futures=True)
+        pendientes.cerrar()
+        if completado:
+            barra.completado()
+        else:
+            barra.descartar()
+        try:
+            indice.guardar()
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el índice local: {e}")
+
+    totales['segundos'] = time.perf_counter() - inicio
+    print(f"✅ Índice actualizado: {totales['archivos']} archivos, {totales['calculados']} calculados "
+          f"({MonitorProgreso._formatear_tamano(totales['bytes'])}) con {hilos} hilos "
+          f"en {totales['segundos']:.1f}s")
+    if totales['errores']:
+        print(f"⚠️ Archivos que no se pudieron leer: {totales['errores']}")
+    return totales
+
+# ==============================================
+# SESIÓN DE SINCRONIZACIÓN
+# ==============================================
+
+def iniciar_diario(directorio_base, operacion, directorio):
+    """
+    Crea el diario de una operación nueva en la raíz de sincronización.
+    
+    Args:
+        directorio_base (str): Carpeta donde está el archivo de configuración
+        operacion (str): Operación en curso ('d', 'u', 's' o 'g')
+        directorio (str): Carpeta local sobre la que se ejecuta la operación
+    
+    Returns:
+        DiarioSincronizacion: Diario listo para registrar
+    """
+    ruta_diario = os.path.join(directorio_base, ARCHIVO_DIARIO)
+    if os.path.exists(ruta_diario):
+        print("⚠️ Se descarta el diario de una operación interrumpida anterior")
+        # Sus descargas parciales ya no se retomarán: eliminar los temporales
+        try:
+            for _, ruta_local in DiarioSincronizacion.cargar(ruta_diario).pendientes('descarga'):
+                if os.path.isfile(ruta_local + SUFIJO_TEMPORAL):
+                    os.remove(ruta_local + SUFIJO_TEMPORAL)
+                    print(f"🧹 Temporal local eliminado: {ruta_local}{SUFIJO_TEMPORAL}")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudieron limpiar los temporales del diario anterior: {e}")
+    nuevo = DiarioSincronizacion(ruta_diario)
+    nuevo.iniciar(operacion, directorio)
+    return nuevo
+
+class SyncSession:
+    """
+    Sesión de sincronización reutilizable para una raíz local.
+
+    Mantiene la conexión FTP entre operaciones y no depende del directorio actual
+    ni de estado global, por lo que pueden convivir varias sesiones en un mismo
+    proceso. Cada operación devuelve un ResultadoSincronizacion.
+
+    Ejemplo:
+        with SyncSession('/datos/proyecto') as sesion:
+            resultado = sesion.sincronizar()
+            if not resultado.exitoso:
+                ...
+    """
+
+    def __init__(self, raiz, config=None, ignore_list=None, pool=None, backend=None):
+        """
+        Args:
+            raiz (str): Carpeta raíz de sincronización
+            config (dict|str): Configuración FTP o ruta a un scb.config
+                               (por defecto el scb.config de la raíz)
+            ignore_list (list): Patrones a ignorar (por defecto los de scb.options)
+            pool (PoolConexiones): Pool compartido con otras sesiones (opcional)
+            backend (str): 'ftplib' o 'asyncio' (por defecto el de la configuración)
+        """
+        self.raiz = os.path.abspath(raiz)
+        if config is None:
+            config = os.path.join(self.raiz, ARCHIVO_CONFIG)
+        if isinstance(config, str):
+            config = cargar_configuracion(config)
+        if backend:
+            config = dict(config, FTP=dict(config['FTP'], backend=backend))
+        validar_configuracion(config)
+        self.config = config
+        if ignore_list is None:
+            ignore_list = leer_ignore_list(os.path.join(self.raiz, ARCHIVO_OPTIONS))
+        self.ignore_list = list(ignore_list)
+        self.ruta_log = os.path.join(self.raiz, 'scb.log')
+        self.pool = pool
+        self.ftp = None
+        self.ruta_remota_base = None
+        self.contador = 0  # Descargas desde la última reconexión
+        self.opciones = leer_opciones(os.path.join(self.raiz, ARCHIVO_OPTIONS))
+        self.inclusion = ReglasInclusion(self.opciones.get('include_list') or [])
+        self.estadisticas = Estadisticas()
+        self.diario = None
+        self.caracteristicas = None  # Respuesta a FEAT del servidor
+        self.instantanea = None
+        self.verificacion_completa = True
+        self.carpetas_modificadas = set()  # Carpetas remotas con cambios subidos
+        self.pendientes_fsync = []  # Descargas aún no forzadas a disco (política 'lote')
+        self.indice = None  # IndiceLocal de la raíz, cargado al primer uso
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    # ----- Conexión -----
+
+    def conectar(self):
+        """Reutiliza la conexión vigente o abre una nueva si no responde"""
+        if self.ftp is not None and conexion_activa(self.ftp):
+            return self.ftp
+        if self.pool:
+            if self.ftp is not None:
+                self.pool.descartar(self.config, self.ftp)
+                self.ftp = None
+            self.ftp = self.pool.obtener(self.config)
+        else:
+            self.ftp = conectar_ftp(self.config)
+        self.contador = 0
+        if self.ruta_remota_base is None:
+            self.ruta_remota_base = self.ftp.pwd()
+        return self.ftp
+
+    def reconectar(self):
+        """Espera a que vuelva la red y abre una conexión nueva (None si no fue posible)"""
+        self.contador = 0
+        self.estadisticas.reconexiones += 1
+        if not self.pool:
+            self.ftp = reconectar_ftp(self.config)
+            return self.ftp
+
+        if self.ftp is not None:
+            self.pool.descartar(self.config, self.ftp)
+            self.ftp = None
+        if not esperar_reconexion():
+            return None
+        print("🔁 Reconectando con servidor FTP...")
+        try:
+            self.ftp = self.pool.obtener(self.config)
+        except Exception as e:
+            print(f"❌ Error al reconectar: {e}")
+        return self.ftp
+
+    def cerrar(self):
+        """Cierra la conexión FTP de la sesión (o la devuelve al pool)"""
+        self.sincronizar_disco()
+        if self.indice is not None:
+            try:
+                self.indice.cerrar()
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar el índice local: {e}")
+            self.indice = None
+        if self.pool:
+            if self.ftp is not None:
+                if conexion_activa(self.ftp):
+                    self.pool.devolver(self.config, self.ftp)
+                else:
+                    self.pool.descartar(self.config, self.ftp)
+        elif self.ftp and hasattr(self.ftp, 'sock') and self.ftp.sock:
+            try:
+                self.ftp.quit()
+            except:
+                pass
+        self.ftp = None
+
+    def soporta(self, ftp, comando):
+        """Indica si el servidor anuncia `comando` en FEAT (se consulta una sola vez)"""
+        if self.caracteristicas is None:
+            try:
+                self.caracteristicas = ftp.sendcmd('FEAT').upper()
+            except ftplib.error_perm:
+                self.caracteristicas = ''
+        return comando in self.caracteristicas
+
+    def sincronizar_disco(self):
+        """Fuerza a disco las descargas acumuladas con la política de fsync 'lote'"""
+        if not self.pendientes_fsync:
             return
+        carpetas = set()
+        for ruta in self.pendientes_fsync:
+            sincronizar_en_disco(ruta)
+            carpetas.add(os.path.dirname(ruta) or '.')
+        for carpeta in carpetas:
+            sincronizar_en_disco(carpeta)
+        self.pendientes_fsync = []
+
+    def ignorado(self, nombre):
+        """Indica si `nombre` nunca se sincroniza: archivos internos, temporales o ignore_list"""
+        return (nombre in ARCHIVOS_INTERNOS or nombre.endswith(SUFIJO_TEMPORAL)
+                or any(fnmatch.fnmatch(nombre, patron) for patron in self.ignore_list))
+
+    def fuera_de_perfil(self, ruta_local, es_carpeta=None):
+        """Indica si el perfil parcial (include_list) excluye `ruta_local` del recorrido"""
+        if not self.inclusion.patrones:
+            return False
+        return not self.inclusion.permite(os.path.relpath(ruta_local, self.raiz), es_carpeta)
+
+    def registrar(self, ftp, accion, descripcion, tipo="archivo"):
+        """Registra una acción en el scb.log de la raíz"""
+        crear_scb_log(ftp, accion, descripcion, tipo, ruta_log=self.ruta_log)
+
+    # ----- Operaciones públicas -----
+
+    def bajar(self, carpeta='.'):
+        """Descarga los cambios del servidor bajo `carpeta` (relativa a la raíz)"""
+        return self._ejecutar('d', self._ruta_local(carpeta))
+
+    def subir(self, carpeta='.'):
+        """Sube los cambios locales bajo `carpeta` (relativa a la raíz)"""
+        return self._ejecutar('u', self._ruta_local(carpeta))
+
+    def sincronizar(self, carpeta='.'):
+        """Descarga y luego sube los cambios bajo `carpeta` (relativa a la raíz)"""
+        print("\n🔄 Iniciando sincronización completa")
+        return self._ejecutar('s', self._ruta_local(carpeta))
+
+    def obtener(self, ruta):
+        """
+        Descarga bajo demanda un archivo o carpeta concreto sin recorrer sus hermanos.
+        Ignora el perfil parcial, de modo que sirve para traer algo que quedó fuera.
+        
+        Args:
+            ruta (str): Archivo o carpeta relativo a la raíz
+        """
+        return self._ejecutar('g', self._ruta_local(ruta))
+
+    def indexar(self, carpeta='.'):
+        """
+        Calcula en paralelo los hashes de los archivos locales bajo `carpeta` que
+        cambiaron desde el último indexado (no usa el servidor).
+        
+        Returns:
+            dict: Totales del indexado ('archivos', 'calculados', 'bytes', 'errores', 'segundos')
+        """
+        return indexar_local(self, self._ruta_local(carpeta))
+
+    def indice_local(self):
+        """Devuelve el IndiceLocal de la raíz (se abre scb.index una sola vez por sesión)"""
+        if self.indice is None:
+            self.indice = IndiceLocal.cargar(os.path.join(self.raiz, ARCHIVO_INDICE))
+        return self.indice
+
+    def reanudar(self):
+        """
+        Continúa una operación interrumpida a partir de su diario, retomando las
+        transferencias a medias y sin volver a recorrer lo ya completado.
+        
+        Returns:
+            ResultadoSincronizacion: Resultado, o None si no había nada que reanudar
+        """
+        ruta_diario = os.path.join(self.raiz, ARCHIVO_DIARIO)
+        if not os.path.exists(ruta_diario):
+            print("✅ No hay ninguna operación interrumpida para reanudar")
+            return None
+
+        diario = DiarioSincronizacion.cargar(ruta_diario)
+        carpeta = os.path.dirname(diario.directorio) if diario.operacion == 'g' else diario.directorio
+        if diario.operacion not in ('d', 'u', 's', 'g') or not os.path.isdir(carpeta):
+            print("⚠️ Diario inválido, se descarta")
+            os.remove(ruta_diario)
+            return None
 
+        print(f"↩️ Reanudando operación '{diario.operacion}' en {diario.directorio} "
+              f"({len(diario.completados)} elementos ya completados)")
+        diario.continuar()
+        self.diario = diario
+        return self._ejecutar(diario.operacion, diario.directorio, reanudar=True)
+
+    # ----- Implementación -----
+
+    def _ruta_local(self, carpeta):
+        ruta = os.path.normpath(os.path.join(self.raiz, carpeta))
+        if os.path.relpath(ruta, self.raiz).startswith('..'):
+            raise ValueError(f"La carpeta {carpeta} está fuera de la raíz {self.raiz}")
+        return ruta
+
+    def _ejecutar(self, operacion, ruta_local, reanudar=False):
+        resultado = ResultadoSincronizacion(operacion, self.raiz)
+        self.estadisticas = resultado.estadisticas
+        self.estadisticas.inicio = time.time()
+        inicio = time.perf_counter()
+        if not reanudar:
+            self.diario = iniciar_diario(self.raiz, operacion, ruta_local)
+
+        try:
+            self.conectar()
+            if operacion == 'g':
+                self._fase_obtener(ruta_local, reanudar, resultado)
+            if operacion in ('d', 's'):
+                if operacion == 's':
+                    print("\n🔽 Fase de descarga:")
+                if 'descarga' in self.diario.fases:
+                    print("⏭️ Fase de descarga ya completada en la ejecución anterior")
+                else:
+                    inicio_fase = time.perf_counter()
+                    self._fase_descarga(ruta_local, reanudar, resultado)
+                    self.estadisticas.tiempos_fase['descarga'] = time.perf_counter() - inicio_fase
+                    self.diario.completar_fase('descarga')
+            if operacion in ('u', 's'):
+                if operacion == 's':
+                    print("\n🔼 Fase de subida:")
+                inicio_fase = time.perf_counter()
+                self._fase_subida(ruta_local, reanudar, resultado)
+                self.estadisticas.tiempos_fase['subida'] = time.perf_counter() - inicio_fase
+            resultado.terminado = True
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            resultado.error = str(e)
+            print(f"❌ Error fatal: {e}")
+        finally:
+            self.diario.cerrar(eliminar=resultado.terminado)
+            self.diario = None
+            self.estadisticas.duracion = time.perf_counter() - inicio
+            exportar_metricas(self, resultado)
+        return resultado
+
+    def _fase_descarga(self, ruta_local, reanudar, resultado):
         # Determinar ruta remota equivalente
-        ruta_relativa = os.path.relpath(os.getcwd(), directorio_base)
+        ruta_relativa = os.path.relpath(ruta_local, self.raiz)
         if ruta_relativa == ".":
-            ruta_inicial_ftp = ftp.pwd()
+            ruta_inicial_ftp = self.ruta_remota_base
         else:
-            ruta_inicial_ftp = os.path.join(ftp.pwd(), ruta_relativa).replace('\\', '/')
+            ruta_inicial_ftp = os.path.join(self.ruta_remota_base, ruta_relativa).replace('\\', '/')
 
         print(f"🔽 Iniciando descarga desde: {ruta_inicial_ftp}")
-        
+
+        cola = ColaReintentos()
+        ftp = self.ftp
+        hechos_raiz = self._preparar_instantanea(ftp, ruta_inicial_ftp)
         try:
-            ftp = descargar_archivos_recursivo(ftp, ruta_inicial_ftp, os.getcwd(), ignore_list)
+            if reanudar:
+                ftp = retomar_pendientes(self, ftp, 'descarga', cola)
+            if ftp:
+                ftp = descargar_archivos_recursivo(self, ftp, ruta_inicial_ftp, ruta_local, cola, hechos_raiz)
         except KeyboardInterrupt:
-            raise  # Propagamos para manejar en el nivel superior
-            
-        if ftp:
+            raise
+        except Exception as e:
+            print(f"⚠️ Error listando {ruta_inicial_ftp}, se reintentará al final: {e}")
+            cola.agregar('descarga', ruta_inicial_ftp, ruta_local, os.path.basename(ruta_local), e)
+
+        self.ftp = procesar_cola_reintentos(self, ftp, cola)
+        self.sincronizar_disco()
+        cola.mostrar()
+        resultado.fallidos.extend(cola.fallidos)
+        self._guardar_instantanea()
+
+        if not cola.fallidos:
             print("✅ Descarga completada exitosamente")
         else:
             print("⚠️ Descarga completada con errores")
 
-    except KeyboardInterrupt:
-        print("\n🛑 Descarga cancelada por el usuario")
-    except Exception as e:
-        print(f"❌ Error fatal: {e}")
-    finally:
-        estadisticas.mostrar()
-        if ftp and hasattr(ftp, 'sock') and ftp.sock:
+    def _fase_obtener(self, ruta_local, reanudar, resultado):
+        ruta_relativa = os.path.relpath(ruta_local, self.raiz)
+        if ruta_relativa == ".":
+            ruta_ftp = self.ruta_remota_base
+        else:
+            ruta_ftp = os.path.join(self.ruta_remota_base, ruta_relativa).replace('\\', '/')
+        nombre = os.path.basename(ruta_local)
+
+        print(f"📥 Obteniendo: {ruta_ftp}")
+
+        cola = ColaReintentos()
+        ftp = self.ftp
+        hechos = obtener_hechos_remotos(ftp, ruta_ftp) if self.soporta(ftp, 'MLST') else None
+        if hechos is None and self.soporta(ftp, 'MLST'):
+            raise FileNotFoundError(f"No existe en el servidor: {ruta_ftp}")
+        if hechos and hechos.get('type') == 'file' and 'modify' in hechos:
+            self.estadisticas.archivos_verificados += 1
+
+        os.makedirs(os.path.dirname(ruta_local), exist_ok=True)
+        self.instantanea = None
+        perfil, self.inclusion = self.inclusion, ReglasInclusion([])
+        try:
             try:
-                ftp.quit()
-            except:
-                pass
-            
-def subir_archivos():
-    """
-    Función principal para subir archivos al servidor FTP.
-    """
-    global estadisticas
-    estadisticas = Estadisticas()
-    ftp = None  # Inicializar para el bloque finally
-    
-    try:
-        print("\n🔼 Iniciando proceso de subida")
-
-        # Buscar archivo de configuración
-        ruta_config = buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd())
-        if not ruta_config:
-            print("❌ Archivo de configuración no encontrado")
-            return
+                if reanudar:
+                    ftp = retomar_pendientes(self, ftp, 'descarga', cola)
+                if ftp:
+                    ftp = procesar_elemento_descarga(self, ftp, ruta_ftp, ruta_local, nombre, cola, hechos)
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                print(f"⚠️ Error obteniendo {ruta_ftp}, se reintentará al final: {e}")
+                cola.agregar('descarga', ruta_ftp, ruta_local, nombre, e)
+            self.ftp = procesar_cola_reintentos(self, ftp, cola)
+        finally:
+            self.inclusion = perfil
+        self.sincronizar_disco()
+        cola.mostrar()
+        resultado.fallidos.extend(cola.fallidos)
+
+        if not cola.fallidos:
+            print("✅ Descarga completada exitosamente")
+        else:
+            print("⚠️ Descarga completada con errores")
 
-        # Obtener lista de archivos a ignorar
-        directorio_base = os.path.dirname(ruta_config)
-        ruta_opciones = os.path.join(directorio_base, ARCHIVO_OPTIONS)
-        ignore_list = leer_ignore_list(ruta_opciones) if ruta_opciones else []
+    def _preparar_instantanea(self, ftp, ruta_inicial_ftp):
+        """
+        Carga la instantánea remota y decide si esta descarga es una verificación completa.
+        
+        Returns:
+            dict: Hechos MLST de la carpeta inicial (None si no se usa la instantánea)
+        """
+        self.instantanea = None
+        if not self.usa_instantanea() or not self.soporta(ftp, 'MLST'):
+            return None
+        hechos = obtener_hechos_remotos(ftp, ruta_inicial_ftp)
+        if not hechos:
+            return None
+        self.instantanea = InstantaneaRemota.cargar(os.path.join(self.raiz, ARCHIVO_INSTANTANEA))
+        if self.instantanea.omision_desactivada:
+            self.verificacion_completa = True
+            print("🔍 Omisión de carpetas sin cambios desactivada: el servidor no permite cambiar la fecha de "
+                  f"carpetas (borra {ARCHIVO_INSTANTANEA} para volver a intentarlo)")
+            return hechos
+        self.verificacion_completa = self.instantanea.ejecuciones % self.usa_instantanea() == 0
+        if self.verificacion_completa and self.instantanea.ejecuciones:
+            print("🔍 Verificación completa del árbol remoto (sin usar la instantánea)")
+        return hechos
+
+    def usa_instantanea(self):
+        """Devuelve cada cuántas descargas se verifica todo (0 si la raíz no usa la instantánea)"""
+        cada = self.opciones.get('verificacion_completa_cada', VERIFICACION_COMPLETA_CADA)
+        return cada if isinstance(cada, int) and cada > 0 else 0
+
+    def desactivar_omision(self, motivo):
+        """Deja de omitir carpetas remotas sin cambios en esta raíz, también en próximas ejecuciones"""
+        print(f"⚠️ {motivo}")
+        print("⚠️ La descarga dejará de omitir carpetas remotas sin cambios en esta raíz")
+        instantanea = self.instantanea or InstantaneaRemota.cargar(os.path.join(self.raiz, ARCHIVO_INSTANTANEA))
+        instantanea.omision_desactivada = True
+        self.verificacion_completa = True
+        try:
+            instantanea.guardar()
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la instantánea remota: {e}")
 
-        # Conectar al servidor FTP
-        config = leer_configuracion(ruta_config)
-        ftp = conectar_ftp(config)
-        if not ftp:
-            print("❌ No se pudo conectar al servidor")
+    def _guardar_instantanea(self):
+        if not self.instantanea:
             return
+        if self.estadisticas.carpetas_omitidas:
+            print(f"⏭️ Carpetas remotas sin cambios omitidas: {self.estadisticas.carpetas_omitidas}")
+        self.instantanea.ejecuciones += 1
+        try:
+            self.instantanea.guardar()
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la instantánea remota: {e}")
+
+    def _fase_subida(self, ruta_local, reanudar, resultado):
+        print("\n🔼 Iniciando proceso de subida")
+        if self.ftp is None:
+            self.conectar()
 
         # Crear estructura de carpetas en FTP
-        ruta_final_ftp = crear_estructura_carpetas_ftp(ftp, os.getcwd(), directorio_base)
+        ruta_final_ftp = crear_estructura_carpetas_ftp(self, self.ftp, ruta_local, self.raiz)
         print(f"📂 Ruta destino: {ruta_final_ftp}")
 
-        # Subir archivos
-        try:
-            subir_archivos_recursivo(ftp, os.getcwd(), ruta_final_ftp, ignore_list)
-        except KeyboardInterrupt:
-            print("\n🛑 Subida cancelada por el usuario")  # Mensaje único aquí
-            return
-            
-        print("✅ Subida completada exitosamente")
+        cola = ColaReintentos()
+        ftp = self.ftp
+        if reanudar:
+            ftp = retomar_pendientes(self, ftp, 'subida', cola)
+        if ftp:
+            ftp = subir_archivos_recursivo(self, ftp, ruta_local, ruta_final_ftp, cola)
+        self.ftp = procesar_cola_reintentos(self, ftp, cola)
+        propagar_modificaciones_remotas(self, self.ftp)
+        cola.mostrar()
+        resultado.fallidos.extend(cola.fallidos)
+
+        if not cola.fallidos:
+            print("✅ Subida completada exitosamente")
+        else:
+            print("⚠️ Subida completada con errores")
 
+# ==============================================
+# FUNCIONES PRINCIPALES DE OPERACIÓN
+# ==============================================
+
+def crear_sesion_actual(backend=None):
+    """
+    Crea una SyncSession para la raíz de sincronización que contiene la carpeta actual.
+    
+    Args:
+        backend (str): Backend FTP a usar (por defecto el de scb.config)
+    
+    Returns:
+        SyncSession: Sesión lista para usar o None si no hay configuración
+    """
+    ruta_config = buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd())
+    if not ruta_config:
+        print("❌ Archivo de configuración no encontrado")
+        return None
+    raiz = os.path.dirname(ruta_config)
+    configurar_logging(raiz)
+    return SyncSession(raiz, leer_configuracion(ruta_config), backend=backend)
+
+def ejecutar_en_carpeta_actual(operacion, mensaje_cancelacion, backend=None, ruta=None):
+    """
+    Ejecuta una operación de SyncSession sobre la carpeta actual y muestra sus estadísticas.
+    
+    Args:
+        operacion (str): Nombre del método de SyncSession ('bajar', 'subir', 'sincronizar',
+                         'obtener', 'reanudar')
+        mensaje_cancelacion (str): Mensaje a mostrar si el usuario interrumpe
+        backend (str): Backend FTP a usar (por defecto el de scb.config)
+        ruta (str): Archivo o carpeta sobre el que operar (por defecto la carpeta actual)
+    
+    Returns:
+        ResultadoSincronizacion: Resultado de la operación (None si no se ejecutó)
+    """
+    sesion = crear_sesion_actual(backend)
+    if not sesion:
+        return None
+
+    try:
+        if operacion == 'reanudar':
+            resultado = sesion.reanudar()
+        else:
+            resultado = getattr(sesion, operacion)(os.path.abspath(ruta) if ruta else os.getcwd())
+        if operacion == 'sincronizar' and resultado and resultado.terminado:
+            print("\n✅ Sincronización completada exitosamente")
+        return resultado
     except KeyboardInterrupt:
-        print("\n🛑 Subida cancelada por el usuario")
-    except Exception as e:
-        print(f"❌ Error fatal: {e}")
+        print(f"\n🛑 {mensaje_cancelacion}")
+        return None
     finally:
-        estadisticas.mostrar()
-        if ftp and hasattr(ftp, 'sock') and ftp.sock:
-            try:
-                ftp.quit()
-            except:
-                pass
+        sesion.estadisticas.mostrar()
+        sesion.cerrar()
+
+def bajar_archivos(backend=None):
+    """
+    Función principal para descargar archivos desde el servidor FTP.
+    """
+    return ejecutar_en_carpeta_actual('bajar', "Descarga cancelada por el usuario", backend)
+
+def subir_archivos(backend=None):
+    """
+    Función principal para subir archivos al servidor FTP.
+    """
+    return ejecutar_en_carpeta_actual('subir', "Subida cancelada por el usuario", backend)
 
-def sincronizar_completo():
+def sincronizar_completo(backend=None):
     """
     Realiza una sincronización bidireccional completa:
     1. Descarga archivos nuevos/modificados del servidor
     2. Sube archivos nuevos/modificados locales al servidor
     """
-    global estadisticas
-    estadisticas = Estadisticas()  # Resetear estadísticas
+    return ejecutar_en_carpeta_actual('sincronizar', "Sincronización interrumpida por el usuario", backend)
+
+def obtener_ruta(ruta, backend=None):
+    """
+    Descarga bajo demanda un archivo o carpeta (relativo a la carpeta actual),
+    aunque quede fuera del perfil parcial de la raíz.
+    """
+    return ejecutar_en_carpeta_actual('obtener', "Descarga cancelada por el usuario", backend, ruta)
+
+def reanudar_operacion(backend=None):
+    """
+    Continúa la operación interrumpida registrada en el diario de la raíz actual.
+    """
+    return ejecutar_en_carpeta_actual('reanudar', "Reanudación interrumpida por el usuario", backend)
+
+def indexar_archivos(backend=None):
+    """
+    Precalcula el índice de hashes de los archivos locales bajo la carpeta actual
+    (sin conectarse al servidor), para hacerlo fuera de las ventanas de sincronización.
+    """
+    sesion = crear_sesion_actual(backend)
+    if not sesion:
+        return None
     try:
-        print("\n🔄 Iniciando sincronización completa")
-        
-        # Fase 1: Descargar cambios del servidor
-        print("\n🔽 Fase de descarga:")
-        bajar_archivos()
-        
-        # Fase 2: Subir cambios locales
-        print("\n🔼 Fase de subida:")
-        subir_archivos()
-        
-        print("\n✅ Sincronización completada exitosamente")
-        
+        return sesion.indexar(os.getcwd())
     except KeyboardInterrupt:
-        print("\n🛑 Sincronización interrumpida por el usuario")
-    except Exception as e:
-        print(f"\n❌ Error durante sincronización: {e}")
+        print("\n🛑 Indexado interrumpido por el usuario (se conserva lo ya calculado)")
+        return None
+    finally:
+        sesion.cerrar()
+
+def leer_lista_raices(ruta_lista):
+    """
+    Lee el archivo con las raíces a sincronizar (una por línea, '#' para comentarios).
+    Las rutas relativas se interpretan respecto de la carpeta del archivo.
+    
+    Args:
+        ruta_lista (str): Ruta al archivo con la lista de raíces
+    
+    Returns:
+        list: Rutas absolutas sin duplicados, en el orden del archivo
+    """
+    base = os.path.dirname(os.path.abspath(ruta_lista))
+    raices = []
+    with open(ruta_lista, 'r', encoding='utf-8') as archivo:
+        for linea in archivo:
+            linea = linea.strip()
+            if not linea or linea.startswith('#'):
+                continue
+            raiz = os.path.normpath(os.path.join(base, os.path.expanduser(linea)))
+            if raiz not in raices:
+                raices.append(raiz)
+    return raices
+
+def sincronizar_multiples(ruta_lista, operacion='s', backend=None):
+    """
+    Sincroniza en paralelo varias raíces, cada una con su propio scb.config.
+    
+    Las raíces comparten un pool de conexiones que limita el total de conexiones
+    abiertas y reutiliza las de un mismo servidor, de modo que el tiempo total se
+    aproxima al de la raíz más lenta y no a la suma de todas.
+    
+    Args:
+        ruta_lista (str): Archivo con la lista de raíces
+        operacion (str): 'd', 'u' o 's'
+        backend (str): Backend FTP a usar en todas las raíces (por defecto el de cada scb.config)
+    
+    Returns:
+        dict: ResultadoSincronizacion por raíz
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    metodo = {'d': 'bajar', 'u': 'subir', 's': 'sincronizar'}[operacion]
+    try:
+        raices = leer_lista_raices(ruta_lista)
+    except OSError as e:
+        print(f"❌ No se pudo leer la lista de raíces: {e}")
+        return {}
+    if not raices:
+        print("⚠️ La lista de raíces está vacía")
+        return {}
+
+    print(f"🗂️ Sincronizando {len(raices)} raíces (máximo {MAX_CONEXIONES_MULTI} conexiones)")
+    pool = PoolConexiones()
+    salida = SalidaConPrefijo(sys.stdout)
+    resultados = {}
+
+    def procesar_raiz(raiz):
+        salida.etiquetar(os.path.basename(raiz) or raiz)
+        resultado = ResultadoSincronizacion(operacion, raiz)
+        try:
+            sesion = SyncSession(raiz, pool=pool, backend=backend)
+        except Exception as e:
+            print(f"❌ Configuración inválida: {e}")
+            resultado.error = str(e)
+            return resultado
+        try:
+            return getattr(sesion, metodo)()
+        except Exception as e:
+            print(f"❌ Error fatal: {e}")
+            resultado.error = str(e)
+            return resultado
+        finally:
+            sesion.cerrar()
+
+    sys.stdout = salida
+    ejecutor = ThreadPoolExecutor(max_workers=min(len(raices), MAX_CONEXIONES_MULTI))
+    try:
+        futuros = {ejecutor.submit(procesar_raiz, raiz): raiz for raiz in raices}
+        for futuro in as_completed(futuros):
+            resultados[futuros[futuro]] = futuro.result()
+    except KeyboardInterrupt:
+        print("\n🛑 Cancelado: se espera a que terminen las raíces en curso")
+        ejecutor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        ejecutor.shutdown(wait=True)
+        sys.stdout = salida.original
+        pool.cerrar()
+
+    mostrar_resumen_multiple(raices, resultados)
+    return resultados
+
+def mostrar_resumen_multiple(raices, resultados):
+    """Muestra el estado y las estadísticas de cada raíz y el total acumulado"""
+    total = Estadisticas()
+    print("\n🗂️ Resumen por raíz:")
+    for raiz in raices:
+        resultado = resultados.get(raiz)
+        if resultado is None:
+            print(f"  ⏹️ {raiz}: no ejecutada")
+            continue
+        total.sumar(resultado.estadisticas)
+        e = resultado.estadisticas
+        detalle = (f"{e.archivos_descargados} descargados, {e.archivos_subidos} subidos, "
+                   f"{e._formatear_tamano(e.tamano_transferido)}, {e.errores} errores")
+        if resultado.error:
+            print(f"  ❌ {raiz}: {resultado.error}")
+        elif resultado.fallidos:
+            print(f"  ⚠️ {raiz}: {detalle}, {len(resultado.fallidos)} fallidos")
+        else:
+            print(f"  ✅ {raiz}: {detalle}")
+    total.mostrar()
+
+# ==============================================
+# PERFILADO DE EJECUCIONES
+# ==============================================
+
+def clasificar_funcion_perfil(clave):
+    """Devuelve la categoría de tiempo de una entrada de pstats ((archivo, línea, función))"""
+    archivo, _, funcion = clave
+    if archivo == '~':
+        for categoria, patrones in CATEGORIAS_PERFIL:
+            if any(patron in funcion for patron in patrones):
+                return categoria
+    return "CPU Python"
+
+def resumen_perfil(estadisticas, total, top=PERFIL_TOP_N):
+    """
+    Genera el resumen legible de un perfil: desglose de tiempo por categoría y
+    funciones más costosas por tiempo propio y acumulado.
+    
+    Args:
+        estadisticas (pstats.Stats): Perfil de la ejecución
+        total (float): Duración real de la ejecución en segundos
+        top (int): Funciones a listar en cada ranking
+    
+    Returns:
+        str: Resumen en texto
+    """
+    import io
+
+    por_categoria = {}
+    for clave, (_, _, propio, _, _) in estadisticas.stats.items():
+        categoria = clasificar_funcion_perfil(clave)
+        por_categoria[categoria] = por_categoria.get(categoria, 0.0) + propio
+    medido = sum(por_categoria.values()) or 1
+
+    lineas = [f"Duración real: {total:.2f}s (hilo principal medido: {medido:.2f}s)", "", "Desglose del tiempo:"]
+    for categoria in [nombre for nombre, _ in CATEGORIAS_PERFIL] + ["CPU Python"]:
+        segundos = por_categoria.get(categoria, 0.0)
+        lineas.append(f"  {categoria:<20} {segundos:8.2f}s {segundos / medido * 100:5.1f}%")
+    lineas.append("")
+    lineas.append("'Espera entre hilos' incluye el escritor de descargas y el bucle del backend")
+    lineas.append("asyncio, cuyos hilos no se perfilan: con asyncio suele ser espera de red.")
+
+    salida = io.StringIO()
+    estadisticas.stream = salida
+    for orden in ('tottime', 'cumulative'):
+        salida.write(f"\n===== Top {top} por {orden} =====\n")
+        estadisticas.sort_stats(orden).print_stats(top)
+    return '\n'.join(lineas) + '\n' + salida.getvalue()
+
+def ejecutar_perfilado(funcion, raiz):
+    """
+    Ejecuta `funcion` bajo cProfile y deja en <raiz>/scb.profile un archivo .pstats
+    y un resumen .txt, también si la ejecución se interrumpe.
+    
+    Args:
+        funcion (callable): Operación a perfilar (sin argumentos)
+        raiz (str): Carpeta donde guardar los resultados
+    
+    Returns:
+        Resultado de `funcion`
+    """
+    import cProfile
+    import pstats
+
+    perfil = cProfile.Profile()
+    inicio = time.perf_counter()
+    try:
+        return perfil.runcall(funcion)
     finally:
-        estadisticas.mostrar()
+        total = time.perf_counter() - inicio
+        try:
+            carpeta = os.path.join(raiz, CARPETA_PERFILES)
+            os.makedirs(carpeta, exist_ok=True)
+            base = os.path.join(carpeta, datetime.now().strftime('%Y%m%d-%H%M%S'))
+            perfil.dump_stats(base + '.pstats')
+            with open(base + '.txt', 'w', encoding='utf-8') as archivo:
+                archivo.write(resumen_perfil(pstats.Stats(perfil), total))
+            print(f"\n🔬 Perfil guardado en {base}.pstats (resumen en {base}.txt)")
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el perfil: {e}")
 
 # ==============================================
 # ENTRADA PRINCIPAL DEL PROGRAMA
@@ -981,26 +3749,67 @@ def main():
     """
     Punto de entrada principal del programa.
     """
-    if len(sys.argv) != 2:
-        print("\nUso: scbox [u|d|s]")
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    backend = None
+    perfilar = False
+    for opcion in (a for a in sys.argv[1:] if a.startswith('--')):
+        if opcion.startswith('--backend='):
+            backend = opcion.split('=', 1)[1].lower()
+        elif opcion == '--profile':
+            perfilar = True
+        else:
+            argumentos = []  # Opción desconocida: mostrar la ayuda
+    if backend is not None and backend not in BACKENDS_FTP:
+        print(f"❌ Backend no válido: {backend}")
+        sys.exit(1)
+
+    operacion = argumentos[0].lower() if argumentos else None
+    es_multi = operacion == "multi" and len(argumentos) in (2, 3)
+    es_get = operacion == "get" and len(argumentos) == 2
+    if not es_multi and not es_get and (len(argumentos) != 1 or operacion in ("multi", "get")):
+        print("\nUso: scbox [u|d|s|resume|index] [opciones] | scbox get <ruta> [opciones]"
+              " | scbox multi <archivo_raices> [u|d|s] [opciones]")
         print("  u: Subir archivos locales al servidor")
         print("  d: Descargar archivos del servidor")
-        print("  s: Sincronización completa (descarga + subida)\n")
+        print("  s: Sincronización completa (descarga + subida)")
+        print("  get: Descargar solo un archivo o carpeta, sin recorrer el resto")
+        print("  resume: Reanudar una operación interrumpida")
+        print("  index: Precalcular los hashes de los archivos locales (sin usar el servidor)")
+        print("  multi: Sincronizar en paralelo las raíces listadas en un archivo")
+        print("Opciones:")
+        print("  --backend=asyncio: Motor FTP a usar (ftplib o asyncio; asyncio solo ayuda con servidores lejanos)")
+        print("  --profile: Perfilar la ejecución y guardar el resultado en scb.profile (no con multi)\n")
         sys.exit(1)
 
-    operacion = sys.argv[1].lower()
+    operaciones = {"u": subir_archivos, "d": bajar_archivos, "s": sincronizar_completo, "resume": reanudar_operacion,
+                   "index": indexar_archivos}
+    if es_multi:
+        modo = argumentos[2].lower() if len(argumentos) == 3 else "s"
+        if modo not in ("u", "d", "s"):
+            print(f"❌ Operación no válida: {modo}")
+            sys.exit(1)
+        if perfilar:
+            # cProfile solo mide el hilo que lo activa y en multi todo el trabajo
+            # ocurre en los hilos de cada raíz: el perfil no mostraría nada útil
+            print("❌ --profile no está disponible con multi: perfila una raíz con 'scbox s --profile' desde su carpeta")
+            sys.exit(1)
+        ejecutar = lambda: sincronizar_multiples(argumentos[1], modo, backend)
+    elif operacion in operaciones or es_get:
+        if es_get:
+            ejecutar = lambda: obtener_ruta(argumentos[1], backend)
+        else:
+            ejecutar = lambda: operaciones[operacion](backend)
+        ruta_config = buscar_archivo_ancestro(ARCHIVO_CONFIG, os.getcwd())
+        raiz = os.path.dirname(ruta_config) if ruta_config else os.getcwd()
+    else:
+        print(f"❌ Operación no válida: {operacion}")
+        sys.exit(1)
 
     try:
-        if operacion == "u":
-            subir_archivos()
-        elif operacion == "d":
-            bajar_archivos()
-        elif operacion == "s":
-            sincronizar_completo()
+        if perfilar:
+            ejecutar_perfilado(ejecutar, raiz)
         else:
-            print(f"❌ Operación no válida: {operacion}")
-            sys.exit(1)
-            
+            ejecutar()
     except KeyboardInterrupt:
         print("\n🛑 Operación cancelada por el usuario")
         sys.exit(0)
@@ -1009,9 +3818,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    # Inicializar archivo de log si no existe
-    if not os.path.exists('scb.log'):
-        with open('scb.log', 'w', encoding='utf-8') as archivo:
-            archivo.write(f"Log iniciado - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,294 @@
+"""
+Servidor FTPS de prueba para SCBox
+
+Servidor FTP mínimo con FTPS explícito (AUTH TLS, PBSZ, PROT P) que sirve una
+carpeta local, pensado para probar SCBox y medir el costo de TLS sin depender
+de un servidor externo. Usa un certificado autofirmado generado con el comando
+`openssl` y registra si cada canal de datos reanudó la sesión TLS del control.
+
+Acepta cualquier usuario y contraseña. No usar fuera de pruebas locales.
+
+Uso:
+    python servidor_ftps_prueba.py <carpeta_a_servir> [puerto]
+
+Muestra el scb.config con el que conectarse (con "tls_ca" apuntando al certificado).
+"""
+
+import calendar
+import json
+import os
+import posixpath
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+
+def generar_certificado(carpeta):
+    """
+    Genera con openssl un certificado autofirmado para 127.0.0.1 y localhost.
+
+    Returns:
+        tuple: (ruta del certificado, ruta de la clave privada)
+    """
+    certificado = os.path.join(carpeta, 'ftps_prueba.pem')
+    clave = os.path.join(carpeta, 'ftps_prueba.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '7',
+                    '-keyout', clave, '-out', certificado, '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost'],
+                   check=True, capture_output=True)
+    return certificado, clave
+
+
+def fecha_ftp(segundos):
+    return datetime.fromtimestamp(segundos, timezone.utc).strftime('%Y%m%d%H%M%S')
+
+
+class ManejadorFTPS(socketserver.StreamRequestHandler):
+    """Atiende una conexión de control: un comando por línea, respuestas en orden"""
+
+    def responder(self, texto):
+        self.wfile.write((texto + '\r\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def ruta(self, argumento):
+        virtual = posixpath.normpath(posixpath.join(self.cwd, argumento or '.'))
+        if not virtual.startswith('/'):
+            virtual = '/' + virtual
+        return virtual, os.path.join(self.server.carpeta, virtual.lstrip('/'))
+
+    def hechos(self, real, nombre):
+        estado = os.stat(real)
+        if os.path.isdir(real):
+            return f"type=dir;modify={fecha_ftp(estado.st_mtime)}; {nombre}"
+        return f"type=file;size={estado.st_size};modify={fecha_ftp(estado.st_mtime)}; {nombre}"
+
+    def abrir_datos(self):
+        conexion, _ = self.pasivo.accept()
+        self.pasivo.close()
+        self.pasivo = None
+        conexion.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.proteger_datos:
+            conexion = self.server.contexto.wrap_socket(conexion, server_side=True)
+            with self.server.lock:
+                self.server.canales_datos += 1
+                self.server.canales_reanudados += conexion.session_reused
+        return conexion
+
+    def cerrar_datos(self, conexion):
+        if isinstance(conexion, ssl.SSLSocket):
+            try:
+                conexion = conexion.unwrap()  # close_notify para que el cliente vea un cierre limpio
+            except OSError:
+                pass
+        conexion.close()
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.cwd = '/'
+        self.pasivo = None
+        self.desplazamiento = 0
+        self.renombrar_desde = None
+        self.proteger_datos = False
+        self.responder('220 Servidor FTPS de prueba de SCBox')
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando, _, argumento = linea.decode('utf-8').rstrip('\r\n').partition(' ')
+            comando = comando.upper()
+            try:
+                self.ejecutar(comando, argumento)
+            except ssl.SSLError:
+                return  # Handshake rechazado (p. ej. el cliente no confía en el certificado)
+            except OSError as e:
+                self.responder(f'550 {e}')
+            if comando == 'QUIT':
+                return
+
+    def ejecutar(self, comando, argumento):
+        responder = self.responder
+        if comando == 'AUTH':
+            responder('234 Negociando TLS')
+            self.request = self.server.contexto.wrap_socket(self.request, server_side=True)
+            self.rfile = self.request.makefile('rb')
+            self.wfile = self.request.makefile('wb')
+        elif comando == 'PBSZ':
+            responder('200 PBSZ=0')
+        elif comando == 'PROT':
+            self.proteger_datos = argumento.upper() == 'P'
+            responder('200 Protección establecida')
+        elif comando == 'USER':
+            responder('331 Contraseña')
+        elif comando == 'PASS':
+            responder('230 Sesión iniciada')
+        elif comando == 'FEAT':
+            responder('211-Funciones')
+            for funcion in ('AUTH TLS', 'PBSZ', 'PROT', 'MLST type*;size*;modify*;', 'SIZE', 'MDTM',
+                            'REST STREAM', 'MFMT', 'EPSV'):
+                responder(' ' + funcion)
+            responder('211 Fin')
+        elif comando in ('TYPE', 'NOOP'):
+            responder('200 OK')
+        elif comando == 'PWD':
+            responder(f'257 "{self.cwd}"')
+        elif comando == 'CWD':
+            virtual, real = self.ruta(argumento)
+            if not os.path.isdir(real):
+                return responder('550 No es una carpeta')
+            self.cwd = virtual
+            responder('250 OK')
+        elif comando == 'CDUP':
+            self.cwd = posixpath.dirname(self.cwd.rstrip('/')) or '/'
+            responder('250 OK')
+        elif comando in ('EPSV', 'PASV'):
+            self.pasivo = socket.socket()
+            self.pasivo.bind(('127.0.0.1', 0))
+            self.pasivo.listen(1)
+            puerto = self.pasivo.getsockname()[1]
+            if comando == 'EPSV':
+                responder(f'229 Modo pasivo extendido (|||{puerto}|)')
+            else:
+                responder(f'227 Modo pasivo (127,0,0,1,{puerto >> 8},{puerto & 255})')
+        elif comando == 'SIZE':
+            _, real = self.ruta(argumento)
+            if not os.path.isfile(real):
+                return responder('550 No existe')
+            responder(f'213 {os.path.getsize(real)}')
+        elif comando == 'MDTM':
+            _, real = self.ruta(argumento)
+            responder(f'213 {fecha_ftp(os.stat(real).st_mtime)}')
+        elif comando == 'MFMT':
+            fecha, _, nombre = argumento.partition(' ')
+            _, real = self.ruta(nombre)
+            segundos = calendar.timegm(time.strptime(fecha[:14], '%Y%m%d%H%M%S'))
+            os.utime(real, (segundos, segundos))
+            responder(f'213 Modify={fecha}; {nombre}')
+        elif comando == 'MLST':
+            virtual, real = self.ruta(argumento)
+            if not os.path.exists(real):
+                return responder('550 No existe')
+            responder('250-Listado')
+            responder(' ' + self.hechos(real, virtual))
+            responder('250 Fin')
+        elif comando in ('MLSD', 'NLST', 'LIST'):
+            _, real = self.ruta(argumento)
+            if not os.path.isdir(real):
+                return responder('550 No es una carpeta')
+            responder('150 Enviando listado')
+            conexion = self.abrir_datos()
+            lineas = [self.hechos(os.path.join(real, nombre), nombre) if comando == 'MLSD'
+                      else (posixpath.join(argumento, nombre) if argumento else nombre)
+                      for nombre in sorted(os.listdir(real))]
+            conexion.sendall(''.join(linea + '\r\n' for linea in lineas).encode('utf-8'))
+            self.cerrar_datos(conexion)
+            responder('226 Listado enviado')
+        elif comando == 'REST':
+            self.desplazamiento = int(argumento)
+            responder('350 Desplazamiento aceptado')
+        elif comando == 'RETR':
+            _, real = self.ruta(argumento)
+            desplazamiento, self.desplazamiento = self.desplazamiento, 0
+            if not os.path.isfile(real):
+                return responder('550 No existe')
+            responder('150 Enviando archivo')
+            conexion = self.abrir_datos()
+            with open(real, 'rb') as archivo:
+                archivo.seek(desplazamiento)
+                while bloque := archivo.read(65536):
+                    conexion.sendall(bloque)
+            self.cerrar_datos(conexion)
+            responder('226 Transferencia completa')
+        elif comando == 'STOR':
+            _, real = self.ruta(argumento)
+            responder('150 Recibiendo archivo')
+            conexion = self.abrir_datos()
+            with open(real, 'wb') as archivo:
+                while bloque := conexion.recv(65536):
+                    archivo.write(bloque)
+            self.cerrar_datos(conexion)
+            responder('226 Archivo guardado')
+        elif comando == 'DELE':
+            _, real = self.ruta(argumento)
+            os.remove(real)
+            responder('250 Eliminado')
+        elif comando == 'MKD':
+            virtual, real = self.ruta(argumento)
+            os.mkdir(real)
+            responder(f'257 "{virtual}" creada')
+        elif comando == 'RNFR':
+            _, real = self.ruta(argumento)
+            if not os.path.exists(real):
+                return responder('550 No existe')
+            self.renombrar_desde = real
+            responder('350 Listo para renombrar')
+        elif comando == 'RNTO':
+            if not self.renombrar_desde:
+                return responder('503 Falta RNFR')
+            _, real = self.ruta(argumento)
+            os.replace(self.renombrar_desde, real)
+            self.renombrar_desde = None
+            responder('250 Renombrado')
+        elif comando == 'QUIT':
+            responder('221 Adiós')
+        else:
+            responder('502 Comando no implementado')
+
+
+class ServidorFTPS(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def iniciar_servidor(carpeta, certificado, clave, puerto=0):
+    """
+    Inicia el servidor en segundo plano sobre 127.0.0.1.
+
+    Args:
+        carpeta (str): Carpeta local que se sirve como raíz remota
+        certificado (str): Certificado PEM del servidor
+        clave (str): Clave privada PEM
+        puerto (int): Puerto de escucha (0 para uno libre)
+
+    Returns:
+        ServidorFTPS: Servidor en marcha (server_address[1] es el puerto;
+                      canales_datos y canales_reanudados cuentan los canales TLS)
+    """
+    contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    contexto.load_cert_chain(certificado, clave)
+    servidor = ServidorFTPS(('127.0.0.1', puerto), ManejadorFTPS)
+    servidor.carpeta = os.path.abspath(carpeta)
+    servidor.contexto = contexto
+    servidor.lock = threading.Lock()
+    servidor.canales_datos = 0
+    servidor.canales_reanudados = 0
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def configuracion_prueba(puerto, certificado):
+    """scb.config para conectarse al servidor de prueba"""
+    return {"FTP": {"ftp_server": "127.0.0.1", "ftp_puerto": puerto, "ftp_user": "prueba",
+                    "ftp_password": "prueba", "tls": True, "tls_ca": certificado}}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or not os.path.isdir(sys.argv[1]):
+        print(__doc__)
+        sys.exit(1)
+    certificado, clave = generar_certificado(tempfile.mkdtemp(prefix='scbox-ftps-'))
+    servidor = iniciar_servidor(sys.argv[1], certificado, clave, int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    print(f"🔒 Sirviendo {servidor.carpeta} en 127.0.0.1:{servidor.server_address[1]} (Ctrl+C para terminar)")
+    print("📄 scb.config:")
+    print(json.dumps(configuracion_prueba(servidor.server_address[1], certificado), indent=4))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n🔁 Canales de datos TLS: {servidor.canales_datos}, "
+              f"reanudados: {servidor.canales_reanudados}")